@@ -0,0 +1,25 @@
+"""Add pids to staging orders
+
+Revision ID: 3c5e1f0a9d27
+Revises: 74b309c44134
+Create Date: 2026-10-16 10:12:41.312457
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e1f0a9d27'
+down_revision = '74b309c44134'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('staging_orders', sa.Column('pids', sa.JSON()))
+
+
+def downgrade():
+    with op.batch_alter_table('staging_orders') as batch_op:
+        batch_op.drop_column('pids')
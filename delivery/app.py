@@ -3,7 +3,7 @@ import os
 
 from tornado.web import URLSpec as url
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 from alembic.config import Config as AlembicConfig
@@ -81,6 +81,23 @@ def routes(**kwargs):
     ]
 
 
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    Configures a new SQLite connection to use write-ahead logging. This lets the request handlers
+    read the database while a staging or delivery is committing its status, and reduces the
+    number of fsync calls made per commit. Connections waiting for a lock will retry for up to
+    30 seconds instead of failing immediately.
+    :param dbapi_connection: the newly created DBAPI connection
+    :param connection_record: the connection record of the connection pool
+    :return: None
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 def create_and_migrate_db(db_engine, alembic_path, db_connection_string):
     """
     Configures alembic and runs any none applied migrations found in the
@@ -145,6 +162,8 @@ def compose_application(config):
 
     db_connection_string = config["db_connection_string"]
     engine = create_engine(db_connection_string, echo=False)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", configure_sqlite_connection)
 
     alembic_path = config["alembic_path"]
     create_and_migrate_db(engine, alembic_path, db_connection_string)
@@ -155,6 +174,22 @@ def compose_application(config):
     staging_repo = DatabaseBasedStagingRepository(
             session_factory=session_factory)
 
+    try:
+        parallel_rsync_workers = config["parallel_rsync_workers"]
+    except KeyError:
+        parallel_rsync_workers = 1
+    if not isinstance(parallel_rsync_workers, int) or parallel_rsync_workers < 1:
+        raise AssertionError(
+                "parallel_rsync_workers must be a positive integer, not: {}".format(parallel_rsync_workers))
+
+    try:
+        staging_mode = config["staging_mode"]
+    except KeyError:
+        staging_mode = "copy"
+    if staging_mode not in ("copy", "hardlink"):
+        raise AssertionError(
+                "staging_mode must be 'copy' or 'hardlink', not: {}".format(staging_mode))
+
     staging_service = StagingService(
             external_program_service=external_program_service,
             runfolder_repo=runfolder_repo,
@@ -162,7 +197,9 @@ def compose_application(config):
             staging_repo=staging_repo,
             staging_dir=staging_dir,
             project_links_directory=project_links_directory,
-            session_factory=session_factory)
+            session_factory=session_factory,
+            parallel_rsync_workers=parallel_rsync_workers,
+            staging_mode=staging_mode)
 
     delivery_repo = DatabaseBasedDeliveriesRepository(
             session_factory=session_factory)
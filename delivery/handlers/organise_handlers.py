@@ -1,6 +1,8 @@
 
 import logging
 
+from tornado.ioloop import IOLoop
+
 from arteria.web.handlers import BaseRestHandler
 from delivery.exceptions import ProjectsDirNotfoundException, ChecksumFileNotFoundException, FileNameParsingException, \
     SamplesheetNotFoundException, ProjectReportNotFoundException, ProjectAlreadyOrganisedException
@@ -21,7 +23,7 @@ class OrganiseRunfolderHandler(BaseOrganiseHandler):
     def initialize(self, organise_service, **kwargs):
         self.organise_service = organise_service
 
-    def post(self, runfolder_id):
+    async def post(self, runfolder_id):
         """
         Attempt to organise projects from the the specified runfolder, so that they can then be staged and delivered.
         A list of project names and/or lane numbers can be specified in the request body to limit which projects
@@ -44,6 +46,9 @@ class OrganiseRunfolderHandler(BaseOrganiseHandler):
         The return format looks like:
             {"organised_path": "/path/to/organised/runfolder/160930_ST-E00216_0111_BH37CWALXX"}
 
+        The organisation only does blocking file system operations, so it is run in a separate thread in
+        order not to block the IOLoop while it is in progress.
+
         """
 
         log.info("Trying to organise runfolder with id: {}".format(runfolder_id))
@@ -63,7 +68,13 @@ class OrganiseRunfolderHandler(BaseOrganiseHandler):
                     [force, lanes, projects]))
 
         try:
-            organised_runfolder = self.organise_service.organise_runfolder(runfolder_id, lanes, projects, force)
+            organised_runfolder = await IOLoop.current().run_in_executor(
+                None,
+                self.organise_service.organise_runfolder,
+                runfolder_id,
+                lanes,
+                projects,
+                force)
 
             self.set_status(OK)
             self.write_json({
@@ -2,7 +2,7 @@
 import os
 import enum as base_enum
 
-from sqlalchemy import Column, Integer, BigInteger, String, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Enum, JSON
 from sqlalchemy.ext.declarative import declarative_base
 
 """
@@ -79,6 +79,10 @@ class StagingOrder(SQLAlchemyBase):
     # which did do it if the status is no longer in progress.
     pid = Column(Integer)
 
+    # The pids of all processes carrying out the staging, if it has been split over several
+    # parallel processes. In that case, pid holds the first of them.
+    pids = Column(JSON)
+
     def get_staging_path(self):
         return os.path.join(self.staging_target)
 
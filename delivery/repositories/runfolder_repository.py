@@ -20,6 +20,8 @@ class FileSystemBasedRunfolderRepository(object):
 
     CHECKSUM_FILE_PATH = os.path.join("MD5", "checksums.md5")
     SAMPLESHEET_PATH = "SampleSheet.csv"
+    # TODO Filter based on expression for runfolders...
+    RUNFOLDER_PATTERN = re.compile(r"^\d+_")
 
     def __init__(
             self,
@@ -75,12 +77,9 @@ class FileSystemBasedRunfolderRepository(object):
                 raise
 
     def _get_runfolder_directories(self):
-        # TODO Filter based on expression for runfolders...
-        runfolder_expression = r"^\d+_"
-
         directories = self.file_system_service.find_runfolder_directories(self._base_path)
         for directory in directories:
-            if re.match(runfolder_expression, os.path.basename(directory)):
+            if self.RUNFOLDER_PATTERN.match(os.path.basename(directory)):
                 yield directory
 
     def _get_runfolder_object(self, directory, ignore_errors=False):
@@ -19,6 +19,8 @@ class RunfolderProjectBasedSampleRepository(object):
     """
 
     filename_regexp = r'^(.+)_(S\d+)_L00(\d+)_([IR])(\d)_\d+\.fastq\.gz$'
+    # compiled once, since the pattern is matched against every file in the project directory
+    filename_pattern = re.compile(filename_regexp)
 
     def __init__(self, file_system_service=FileSystemService()):
         self.file_system_service = file_system_service
@@ -36,7 +38,7 @@ class RunfolderProjectBasedSampleRepository(object):
     def _get_samples(self, project_path, project_name, runfolder):
 
         def _is_fastq_file(f):
-            return re.match(self.filename_regexp, f) is not None
+            return self.filename_pattern.match(f) is not None
 
         def _name_from_sample_file(s):
             subdir = self.file_system_service.relpath(os.path.dirname(s.file_path), project_path)
@@ -52,10 +54,10 @@ class RunfolderProjectBasedSampleRepository(object):
             _is_fastq_file,
             self.file_system_service.list_files_recursively(project_path))
 
-        # create SampleFile objects from the paths
-        project_sample_files = list(map(
+        # create SampleFile objects from the paths, streaming them directly into the grouping below
+        project_sample_files = map(
             _sample_file_from_path,
-            project_fastq_files))
+            project_fastq_files)
 
         # get the sample names and corresponding sample id from the SampleFile objects and gather a list of
         # the SampleFile objects belonging to each sample name and sample id tuple
@@ -96,7 +98,7 @@ class RunfolderProjectBasedSampleRepository(object):
         :return: a SampleFile instance
         """
         file_name = os.path.basename(sample_path)
-        m = re.match(self.filename_regexp, file_name)
+        m = self.filename_pattern.match(file_name)
         if not m or len(m.groups()) != 5:
             raise FileNameParsingException("Could not parse information from file name '{}'".format(file_name))
         sample_name = str(m.group(1))
@@ -14,16 +14,19 @@ class ExternalProgramService(object):
     """
 
     @staticmethod
-    def run(cmd):
+    def run(cmd, start_new_session=False):
         """
         Run a process and do not wait for it to finish
         :param cmd: the command to run as a list, i.e. ['ls','-l', '/']
+        :param start_new_session: if True, the process is started in a new session, and thus process group, so that
+                                  it can be signalled together with any child processes it starts
         :return: A instance of Execution
         """
         p = Subprocess(cmd,
                        stdout=PIPE,
                        stderr=PIPE,
-                       stdin=PIPE)
+                       stdin=PIPE,
+                       start_new_session=start_new_session)
         return Execution(pid=p.pid, process_obj=p)
 
     @staticmethod
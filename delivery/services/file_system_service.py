@@ -1,8 +1,11 @@
 
+import errno
 import os
 import logging
 import shutil
 
+from contextlib import contextmanager
+
 log = logging.getLogger(__name__)
 
 
@@ -25,6 +28,19 @@ class FileSystemService(object):
             if os.path.isdir(dir_abs_path):
                 yield dir_abs_path
 
+    @staticmethod
+    def list_directory_entries(path):
+        """
+        List the names of all entries in a directory, using a single directory read
+        :param path: to the directory to list
+        :return: a set with the names of the entries in the directory, empty if the directory does not exist
+        """
+        try:
+            with os.scandir(path) as entries:
+                return {entry.name for entry in entries}
+        except (FileNotFoundError, NotADirectoryError):
+            return set()
+
     def find_project_directories(self, projects_base_dir):
         """
         Find project directories
@@ -43,8 +59,29 @@ class FileSystemService(object):
 
     @staticmethod
     def list_files_recursively(base_path):
-        for root, dirs, files in os.walk(base_path):
-            yield from map(lambda f: os.path.join(root, f), files)
+        """
+        List all files below a directory. Like os.walk, symlinks to directories are not followed and
+        directories that cannot be read are skipped. The file type information returned by
+        os.scandir is used, so no extra stat call is needed per entry.
+        :param base_path: directory to list files in
+        :return: a generator of paths to files
+        """
+        dirs_to_scan = [base_path]
+        while dirs_to_scan:
+            try:
+                entries = os.scandir(dirs_to_scan.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        yield entry.path
+                    elif not entry.is_symlink():
+                        dirs_to_scan.append(entry.path)
 
     @staticmethod
     def isdir(path):
@@ -82,25 +119,88 @@ class FileSystemService(object):
         """
         return os.path.abspath(path)
 
-    def symlink(self, source, link_name):
+    def symlink(self, source, link_name, create_parent_dirs=True):
         """
         Shadows os.symlink
         :param source: of link
         :param link_name: the name of the link to create
+        :param create_parent_dirs: if True, the directory of the link will be created if it doesn't exist
         :return: None
         """
-        self.makedirs(self.dirname(link_name), exist_ok=True)
+        if create_parent_dirs:
+            self.makedirs(self.dirname(link_name), exist_ok=True)
         return os.symlink(source, link_name)
 
+    @staticmethod
+    def symlink_at(source, link_name, dir_fd):
+        """
+        Shadows os.symlink, creating the link relative to an open directory
+        :param source: of link
+        :param link_name: the name of the link to create, relative to the directory
+        :param dir_fd: a file descriptor for the directory in which to create the link
+        :return: None
+        """
+        return os.symlink(source, link_name, dir_fd=dir_fd)
+
+    @staticmethod
+    @contextmanager
+    def open_directory(path):
+        """
+        Context manager that opens a directory and closes it on exit. The directory is only opened
+        for use as a dir_fd anchor, so O_PATH is used where available, which does not require read
+        permission on the directory.
+        :param path: to the directory to open
+        :return: a file descriptor for the open directory
+        """
+        dir_fd = os.open(path, getattr(os, "O_PATH", os.O_RDONLY) | os.O_DIRECTORY)
+        try:
+            yield dir_fd
+        finally:
+            os.close(dir_fd)
+
+    @staticmethod
+    def _copy_file_range(source, dest):
+        """
+        Copy a file using os.copy_file_range, which lets the kernel copy the data without passing it
+        through user space and, on file systems that support it, share the data blocks between the
+        files instead of copying them.
+        :param source: path to the file to copy
+        :param dest: path to the copy
+        :return: True if the file was copied, False if copy_file_range is not supported for the
+        files, in which case nothing has been copied
+        """
+        with open(source, 'rb') as fsrc, open(dest, 'wb') as fdst:
+            copied = 0
+            while True:
+                try:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1024 * 1024 * 1024)
+                except OSError as e:
+                    if copied == 0 and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                        return False
+                    raise
+                if n == 0:
+                    # some kernels and file systems report that nothing was copied, rather than
+                    # failing, when copy_file_range is not supported for the files
+                    return copied > 0 or os.fstat(fsrc.fileno()).st_size == 0
+                copied += n
+
     @staticmethod
     def copy(source, dest):
         """
-        Shadows shutil.copyfile
+        Shadows shutil.copyfile. Where available, os.copy_file_range is used for copying files, falling
+        back to shutil.copyfile. Directories are copied with shutil.copytree.
         :param source:
         :param dest:
         :return: None
+        :raises shutil.SameFileError: if source and dest are the same file
         """
+        # dest is truncated before copy_file_range is tried, so make sure it is not the source itself,
+        # or a link to it, first
+        if os.path.exists(dest) and os.path.samefile(source, dest):
+            raise shutil.SameFileError("{!r} and {!r} are the same file".format(source, dest))
         try:
+            if hasattr(os, "copy_file_range") and FileSystemService._copy_file_range(source, dest):
+                return dest
             return shutil.copyfile(source, dest)
         except IsADirectoryError:
             return shutil.copytree(source, dest, symlinks=True)
@@ -123,6 +223,18 @@ class FileSystemService(object):
         """
         os.makedirs(path, **kwargs)
 
+    @staticmethod
+    def makedirs_batch(paths):
+        """
+        Create a number of directories, including any missing parents. Each unique directory is
+        created once and directories are created in order of depth, so that parents are in place
+        before their children.
+        :param paths: an iterable of paths to directories to create
+        :return: None
+        """
+        for path in sorted(set(paths), key=lambda p: p.count(os.sep)):
+            os.makedirs(path, exist_ok=True)
+
     @staticmethod
     def exists(path):
         return os.path.exists(path)
@@ -137,4 +249,18 @@ class FileSystemService(object):
 
     @staticmethod
     def relpath(path, start):
+        """
+        Shadows os.path.relpath. Paths are typically located below the start directory, in which
+        case the relative path is just the remainder of the path. This is used as long as the
+        remainder is in normalised form, otherwise the computation is left to os.path.relpath.
+        :param path: to get the relative path for
+        :param start: the directory that the path should be relative to
+        :return: the relative path as per os.path.relpath
+        """
+        if start:
+            prefix = start.rstrip(os.sep) + os.sep
+            if path.startswith(prefix):
+                remainder = path[len(prefix):]
+                if all(part not in ("", ".", "..") for part in remainder.split(os.sep)):
+                    return remainder
         return os.path.relpath(path, start)
@@ -12,6 +12,9 @@ class MetadataService(object):
     Metadata service, used for reading and writing metadata files associated with the service.
     """
 
+    # the size of the blocks that files are read in when computing checksums
+    HASH_BLOCK_SIZE = 1024 * 1024
+
     @staticmethod
     def extract_samplesheet_data(samplesheet_file):
 
@@ -40,9 +43,10 @@ class MetadataService(object):
 
     @staticmethod
     def write_checksum_file(checksum_file, checksums):
+        # build the file contents up front so that they can be written with a single call
         with open(checksum_file, "w") as fh:
-            for file_path, checksum in checksums.items():
-                fh.write("{}  {}\n".format(checksum, file_path))
+            fh.write("".join(
+                "{}  {}\n".format(checksum, file_path) for file_path, checksum in checksums.items()))
 
     @staticmethod
     def write_samplesheet_file(samplesheet_file, samplesheet_data):
@@ -66,8 +70,18 @@ class MetadataService(object):
 
     @staticmethod
     def hash_file(input_file):
+        """
+        Computes the checksum of a file. The file is read in fixed-size blocks into a reused buffer, rather than line by
+        line, since the files are typically large and binary, e.g. compressed fastq files.
+        :param input_file: path to the file to hash
+        :return: the hex digest of the file contents
+        """
         hasher_obj = MetadataService.get_hash_object()
-        with open(input_file, 'rb') as fh:
-            for line in fh:
-                hasher_obj.update(line)
+        buffer = bytearray(MetadataService.HASH_BLOCK_SIZE)
+        view = memoryview(buffer)
+        with open(input_file, 'rb', buffering=0) as fh:
+            n = fh.readinto(buffer)
+            while n:
+                hasher_obj.update(view[:n])
+                n = fh.readinto(buffer)
         return hasher_obj.hexdigest()
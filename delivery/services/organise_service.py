@@ -1,7 +1,11 @@
 
 import logging
 import os
+import threading
 import time
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
 
 from delivery.exceptions import ProjectAlreadyOrganisedException
 
@@ -29,8 +33,41 @@ class OrganiseService(object):
         """
         self.runfolder_service = runfolder_service
         self.file_system_service = file_system_service
+        # locks used to serialise concurrent organisation of the same runfolder. A lock is only kept for as
+        # long as some thread holds or waits for it
+        self._runfolder_locks = weakref.WeakValueDictionary()
+        self._runfolder_locks_lock = threading.Lock()
+
+    def _runfolder_lock(self, runfolder_id):
+        """
+        Get the lock used to serialise organisation of a runfolder
+        :param runfolder_id: the name of the runfolder
+        :return: a threading.Lock instance for the runfolder
+        """
+        with self._runfolder_locks_lock:
+            lock = self._runfolder_locks.get(runfolder_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._runfolder_locks[runfolder_id] = lock
+            return lock
 
     def organise_runfolder(self, runfolder_id, lanes, projects, force):
+        """
+        Organise a runfolder in preparation for delivery. This will create separate subdirectories for each of the
+        projects and symlink all files belonging to the project to be delivered under this directory. Concurrent
+        calls for the same runfolder are serialised, since they may create or move the same paths.
+
+        :param runfolder_id: the name of the runfolder to be organised
+        :param lanes: if not None, only samples on any of the specified lanes will be organised
+        :param projects: if not None, only projects in this list will be organised
+        :param force: if True, a previously organised project will be renamed with a unique suffix
+        :raises ProjectAlreadyOrganisedException: if a project has already been organised and force is False
+        :return: a Runfolder instance representing the runfolder after organisation
+        """
+        with self._runfolder_lock(runfolder_id):
+            return self._organise_runfolder(runfolder_id, lanes, projects, force)
+
+    def _organise_runfolder(self, runfolder_id, lanes, projects, force):
         """
         Organise a runfolder in preparation for delivery. This will create separate subdirectories for each of the
         projects and symlink all files belonging to the project to be delivered under this directory.
@@ -49,13 +86,29 @@ class OrganiseService(object):
 
         # handle previously organised projects
         organised_projects_path = os.path.join(runfolder.path, "Projects")
+        # keep track of paths that are shared between projects, e.g. the backup directory, so that
+        # the file system is only queried once for them. The organised project paths are all located
+        # directly under the organised projects path, so a single listing of it tells which exist
+        organised_project_names = self.file_system_service.list_directory_entries(organised_projects_path)
+        existing_paths = {
+            os.path.join(organised_projects_path, project.name): project.name in organised_project_names
+            for project in projects_on_runfolder}
+        # use the same timestamp for all projects moved to the backup location by this call
+        backup_timestamp = time.time()
         for project in projects_on_runfolder:
-            self.check_previously_organised_project(project, organised_projects_path, force)
+            self.check_previously_organised_project(
+                project, organised_projects_path, force, existing_paths=existing_paths, timestamp=backup_timestamp)
 
-        # organise the projects and return a new Runfolder instance
-        organised_projects = []
-        for project in projects_on_runfolder:
-            organised_projects.append(self.organise_project(runfolder, project, organised_projects_path, lanes))
+        # the lanes are looked up once for each sample file, so use a set for the lookups
+        lanes = frozenset(lanes) if lanes else None
+
+        # organise the projects and return a new Runfolder instance. The projects are organised into separate
+        # directories and the work is dominated by file system calls, so organise them in parallel
+        with ThreadPoolExecutor(max_workers=self._max_workers(projects_on_runfolder)) as executor:
+            organised_projects = list(
+                executor.map(
+                    lambda project: self.organise_project(runfolder, project, organised_projects_path, lanes),
+                    projects_on_runfolder))
 
         return Runfolder(
             runfolder.name,
@@ -63,21 +116,59 @@ class OrganiseService(object):
             projects=organised_projects,
             checksums=runfolder.checksums)
 
-    def check_previously_organised_project(self, project, organised_projects_path, force):
+    @staticmethod
+    def _max_workers(projects):
+        """
+        The number of worker threads to use when organising the supplied projects
+        :param projects: list of projects to organise
+        :return: the number of worker threads to use
+        """
+        return max(1, min(32, len(projects)))
+
+    def _path_exists(self, path, existing_paths):
+        """
+        Check if a path exists, using and updating the supplied dict of previously checked paths
+
+        :param path: the path to check
+        :param existing_paths: a dict mapping previously checked paths to their existence status
+        :return: True if the path exists, False otherwise
+        """
+        if path not in existing_paths:
+            existing_paths[path] = self.file_system_service.exists(path)
+        return existing_paths[path]
+
+    def check_previously_organised_project(
+            self, project, organised_projects_path, force, existing_paths=None, timestamp=None):
+        """
+        Check if a project has already been organised and, if force is True, move the previously
+        organised project to a backup location.
+
+        :param project: a Project instance representing the project to be organised
+        :param organised_projects_path: the path under which projects are organised
+        :param force: if True, a previously organised project will be moved to a backup location
+        :param existing_paths: if not None, a dict used to cache the existence status of paths, e.g. as
+        listed up front or shared between projects
+        :param timestamp: if not None, the timestamp used as suffix for the backup location, otherwise
+        the current time is used
+        :raises ProjectAlreadyOrganisedException: if the project has already been organised and force is False
+        """
+        existing_paths = {} if existing_paths is None else existing_paths
         organised_project_path = os.path.join(organised_projects_path, project.name)
-        if self.file_system_service.exists(organised_project_path):
+        if self._path_exists(organised_project_path, existing_paths):
             msg = "Organised project path '{}' already exists".format(organised_project_path)
             if not force:
                 raise ProjectAlreadyOrganisedException(msg)
             organised_projects_backup_path = "{}.bak".format(organised_projects_path)
             backup_path = os.path.join(
                 organised_projects_backup_path,
-                "{}.{}".format(project.name, str(time.time())))
+                "{}.{}".format(project.name, str(timestamp or time.time())))
             log.info(msg)
             log.info("existing path '{}' will be moved to '{}'".format(organised_project_path, backup_path))
-            if not self.file_system_service.exists(organised_projects_backup_path):
+            if not self._path_exists(organised_projects_backup_path, existing_paths):
                 self.file_system_service.mkdir(organised_projects_backup_path)
+                existing_paths[organised_projects_backup_path] = True
             self.file_system_service.rename(organised_project_path, backup_path)
+            existing_paths[organised_project_path] = False
 
     def organise_project(self, runfolder, project, organised_projects_path, lanes):
         """
@@ -91,11 +182,22 @@ class OrganiseService(object):
         :raises ProjectAlreadyOrganisedException: if project has already been organised
         :return: a Project instance representing the project after organisation
         """
-        # symlink the samples
         organised_project_path = os.path.join(organised_projects_path, project.name)
         organised_project_runfolder_path = os.path.join(organised_project_path, runfolder.name)
+        # the samples may be supplied as a generator and are iterated more than once below
+        samples = list(project.samples)
+
+        # create the project directory and the directories for all samples having files to organise
+        # in one pass, rather than once for each symlinked file
+        self.file_system_service.makedirs_batch(
+            [organised_project_runfolder_path] + [
+                os.path.join(organised_project_runfolder_path, sample.sample_id)
+                for sample in samples
+                if any(self._is_sample_file_in_lanes(sample_file, lanes) for sample_file in sample.sample_files)])
+
+        # symlink the samples
         organised_samples = []
-        for sample in project.samples:
+        for sample in samples:
             organised_samples.append(
                 self.organise_sample(
                     sample,
@@ -171,19 +273,38 @@ class OrganiseService(object):
         # symlink each sample in its own directory
         organised_sample_path = os.path.join(organised_project_path, sample.sample_id)
 
-        # symlink the sample files using relative paths
-        organised_sample_files = []
-        for sample_file in sample.sample_files:
-            organised_sample_files.append(
-                self.organise_sample_file(
-                    sample_file,
-                    organised_sample_path,
-                    lanes
-                )
-            )
+        # skip sample files derived from lanes that shouldn't be included
+        sample_files = [
+            sample_file for sample_file in sample.sample_files if self._is_sample_file_in_lanes(sample_file, lanes)]
 
-        # clean up the list of sample files by removing None elements
-        organised_sample_files = list(filter(None, organised_sample_files))
+        # symlink the sample files using relative paths. The sample files typically share the same
+        # source directory, so the relative path to each source directory is only computed once
+        source_dir_relpaths = {}
+        organised_sample_files = []
+        if sample_files:
+            # look up the methods used in the loop below once
+            dirname = os.path.dirname
+            relpath = self.file_system_service.relpath
+            organise_sample_file = self.organise_sample_file
+
+            # open the sample directory once and create the symlinks relative to it, so that the full
+            # path to the sample directory does not have to be resolved for each symlink
+            with self.file_system_service.open_directory(organised_sample_path) as sample_dir_fd:
+                for sample_file in sample_files:
+                    source_dir = dirname(sample_file.file_path)
+                    if source_dir not in source_dir_relpaths:
+                        source_dir_relpaths[source_dir] = relpath(
+                            source_dir,
+                            organised_sample_path)
+                    organised_sample_files.append(
+                        organise_sample_file(
+                            sample_file,
+                            organised_sample_path,
+                            lanes,
+                            source_dir_relpath=source_dir_relpaths[source_dir],
+                            dir_fd=sample_dir_fd
+                        )
+                    )
 
         return Sample(
             name=sample.name,
@@ -191,22 +312,30 @@ class OrganiseService(object):
             sample_id=sample.sample_id,
             sample_files=organised_sample_files)
 
-    def organise_sample_file(self, sample_file, organised_sample_path, lanes):
+    @staticmethod
+    def _is_sample_file_in_lanes(sample_file, lanes):
+        return not lanes or sample_file.lane_no in lanes
+
+    def organise_sample_file(self, sample_file, organised_sample_path, lanes, source_dir_relpath=None, dir_fd=None):
         """
         Organise a sample file by creating a relative symlink in the supplied directory,
         pointing back to the supplied SampleFile's original file path. The Sample file can be
         excluded from organisation based on the lane it was derived from. The supplied directory
-        will be created if it doesn't exist.
+        is expected to exist, see `organise_project`.
 
         :param sample_file: a SampleFile instance representing the sample file to be organised
         :param organised_sample_path: the path to the organised sample directory under which to
         place the symlink
         :param lanes: if not None, only sample files derived from any of the specified lanes will
         be organised
+        :param source_dir_relpath: if not None, the pre-computed relative path from the organised
+        sample directory to the directory of the sample file
+        :param dir_fd: if not None, a file descriptor for the opened organised sample directory, which
+        the symlink will be created relative to
         :return: a new SampleFile instance representing the sample file after organisation
         """
         # skip if the sample file data is derived from a lane that shouldn't be included
-        if lanes and sample_file.lane_no not in lanes:
+        if not self._is_sample_file_in_lanes(sample_file, lanes):
             return None
 
         # create the symlink in the supplied directory and relative to the file's original location
@@ -216,13 +345,19 @@ class OrganiseService(object):
         )
 
         # get the relative path between the source file and the organised directory
-        relative_path = self.file_system_service.relpath(
-            sample_file.file_path,
-            organised_sample_path
-        )
+        if source_dir_relpath is None:
+            relative_path = self.file_system_service.relpath(
+                sample_file.file_path,
+                organised_sample_path
+            )
+        else:
+            relative_path = os.path.join(source_dir_relpath, sample_file.file_name)
 
         # create the symlink using the relative path
-        self.file_system_service.symlink(relative_path, destination)
+        if dir_fd is None:
+            self.file_system_service.symlink(relative_path, destination, create_parent_dirs=False)
+        else:
+            self.file_system_service.symlink_at(relative_path, sample_file.file_name, dir_fd)
 
         # return a new SampleFile instance representing the sample file after organisation
         return SampleFile(
@@ -21,26 +21,21 @@ class RunfolderService(object):
         else:
             return runfolder
 
-    def _validate_project_lists(self, projects_on_runfolder, projects_to_stage):
-        projects_to_stage_set = set(projects_to_stage)
-        projects_on_runfolder_set = set(projects_on_runfolder)
-        return projects_to_stage_set.issubset(projects_on_runfolder_set)
-
     def find_projects_on_runfolder(self, runfolder, only_these_projects=None):
 
-        names_of_project_on_runfolder = list(map(lambda x: x.name, runfolder.projects))
+        names_of_project_on_runfolder = set(map(lambda x: x.name, runfolder.projects))
 
         # If no projects have been specified, get all projects
         if only_these_projects:
-            projects_to_return = only_these_projects
+            projects_to_return = set(only_these_projects)
         else:
             projects_to_return = names_of_project_on_runfolder
 
         log.debug("Projects to stage: {}".format(projects_to_return))
 
-        if not self._validate_project_lists(names_of_project_on_runfolder, projects_to_return):
+        if not projects_to_return.issubset(names_of_project_on_runfolder):
             raise ProjectNotFoundException("Projects to stage: {} do not match projects on runfolder: {}".
-                                           format(projects_to_return, names_of_project_on_runfolder))
+                                           format(only_these_projects, list(map(lambda x: x.name, runfolder.projects))))
 
         for project in runfolder.projects:
             if project.name in projects_to_return:
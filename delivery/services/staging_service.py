@@ -1,10 +1,13 @@
 
 import logging
 import os
+import shutil
 import signal
 import re
+import tempfile
 
 from tornado import gen
+from tornado.ioloop import IOLoop
 
 from delivery.models.db_models import StagingStatus
 from delivery.exceptions import RunfolderNotFoundException, InvalidStatusException,\
@@ -37,6 +40,10 @@ class StagingService(object):
     #  briefly while doing so (I think row level locking is limited in sqlite.)"
     #  / JD 20161111
 
+    # Matches the total file size in the output of rsync stats, e.g.:
+    # Total file size: 207,707,566 bytes
+    TOTAL_FILE_SIZE_PATTERN = re.compile(r'Total file size: ([\d,.]+) bytes', re.MULTILINE)
+
     def __init__(self,
                  staging_dir,
                  external_program_service,
@@ -45,7 +52,9 @@ class StagingService(object):
                  project_dir_repo,
                  project_links_directory,
                  session_factory,
-                 file_system_service = FileSystemService):
+                 file_system_service = FileSystemService,
+                 parallel_rsync_workers=1,
+                 staging_mode="copy"):
         """
         Instantiate a new StagingService
         :param staging_dir: the directory to which files/dirs should be staged
@@ -56,6 +65,9 @@ class StagingService(object):
         :param project_links_directory: a path to a directory where links will be created temporarily
                                         before they are rsynced into staging (for batched deliveries etc)
         :param session_factory: a factory method which can produce new sqlalchemy Session instances
+        :param parallel_rsync_workers: the number of rsync processes to split each staging order over
+        :param staging_mode: "copy" to copy the files with rsync, or "hardlink" to hard link the files
+                             into the staging directory when it is on the same file system as the source
         """
         self.staging_dir = staging_dir
         self.external_program_service = external_program_service
@@ -65,10 +77,144 @@ class StagingService(object):
         self.project_links_directory = project_links_directory
         self.session_factory = session_factory
         self.file_system_service = file_system_service
+        self.parallel_rsync_workers = parallel_rsync_workers
+        self.staging_mode = staging_mode
+
+    @staticmethod
+    def _split_source_files(source, n_chunks):
+        """
+        Split the files below a directory into chunks of roughly equal total size. Symlinks are
+        followed, in the same way as rsync does when run with --copy-links.
+        :param source: the directory to list files in
+        :param n_chunks: the maximum number of chunks to split the files into
+        :return: a list of non-empty lists with paths to files, relative to the source directory
+        """
+        files_with_size = []
+        for dirpath, _, filenames in os.walk(source, followlinks=True):
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                files_with_size.append((os.stat(file_path).st_size, os.path.relpath(file_path, source)))
+
+        # assign the largest files first, each one to the chunk with the smallest total size so far
+        chunks = [[0, []] for _ in range(n_chunks)]
+        for size, file_path in sorted(files_with_size, reverse=True):
+            chunk = min(chunks, key=lambda c: c[0])
+            chunk[0] += size
+            chunk[1].append(file_path)
+        return [chunk_files for _, chunk_files in chunks if chunk_files]
+
+    @staticmethod
+    def _write_file_lists(source, n_chunks, file_lists_dir):
+        """
+        Split the files below a directory into chunks and write each chunk to a file list, with NUL
+        separated paths, that can be passed to rsync with --from0 --files-from
+        :param source: the directory to list files in
+        :param n_chunks: the maximum number of chunks to split the files into
+        :param file_lists_dir: the directory in which to write the file lists
+        :return: a list with paths to the written file lists
+        """
+        file_lists = []
+        for i, chunk_files in enumerate(StagingService._split_source_files(source, n_chunks)):
+            file_list = os.path.join(file_lists_dir, "chunk_{}".format(i))
+            with open(file_list, "w") as fh:
+                fh.write("".join("{}\0".format(file_path) for file_path in chunk_files))
+            file_lists.append(file_list)
+        return file_lists
+
+    @staticmethod
+    def _is_on_same_file_system(source, target):
+        """
+        Check if all files below a directory are located on the same file system as a target directory, so that
+        hard links to them can be created in the target. Symlinks are followed, in the same way as when the files
+        are linked with cp -L, so it is the files that the symlinks resolve to that are checked.
+        :param source: the directory with the files to link
+        :param target: the directory in which the links would be created
+        :return: True if all files are on the same file system as the target, False otherwise
+        """
+        target_device = os.stat(target).st_dev
+        for dirpath, _, filenames in os.walk(source, followlinks=True):
+            for filename in filenames:
+                if os.stat(os.path.join(dirpath, filename)).st_dev != target_device:
+                    return False
+        return True
+
+    @staticmethod
+    def _size_of_files(directory):
+        """
+        Compute the total size of the files below a directory, corresponding to the 'Total file size'
+        reported by rsync
+        :param directory: the directory to compute the size for
+        :return: the total size of the files in bytes
+        """
+        size = 0
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+        return size
+
+    @staticmethod
+    def _parse_size_of_transfer(rsync_stdout):
+        """
+        Parse the file size from the output of rsync stats:
+        Total file size: 207,707,566 bytes
+        :param rsync_stdout: the output from rsync run with --stats
+        :return: the total size of the transferred files in bytes
+        """
+        match = StagingService.TOTAL_FILE_SIZE_PATTERN.search(rsync_stdout)
+        size_of_transfer = match.group(1)
+        return int(size_of_transfer.replace(",", "").replace(".", ""))
+
+    @staticmethod
+    def _clear_directory(directory):
+        """
+        Remove everything below a directory, leaving the directory itself empty
+        :param directory: the directory to clear
+        :return: None
+        """
+        shutil.rmtree(directory)
+        os.makedirs(directory)
+
+    @staticmethod
+    @gen.coroutine
+    def _run_staging_commands(cmds, external_program_service, staging_order, session):
+        """
+        Run the commands carrying out a staging order in parallel, and wait for all of them to finish. The pids
+        of the processes are recorded on the staging order, so that they can be killed.
+        :param cmds: the commands to run
+        :param external_program_service: A instance of ExternalProgramService
+        :param staging_order: the staging order carried out by the commands
+        :param session: the sql alchemy Session the staging order belongs to
+        :return: a list with the execution results of the commands
+        """
+        executions = []
+        try:
+            for cmd in cmds:
+                log.debug("Running staging command: {}".format(" ".join(cmd)))
+                # start each process in its own process group, so that any processes it spawns can be killed with it
+                executions.append(external_program_service.run(cmd, start_new_session=True))
+        except Exception:
+            # the processes have not been recorded on the staging order yet, so kill the ones that were
+            # started here, rather than leaving them running
+            for execution in executions:
+                try:
+                    StagingService._kill_process_group(execution.pid)
+                except OSError as e:
+                    log.warning("Failed to kill staging process with pid: {}: {}".format(execution.pid, e))
+            raise
+
+        staging_order.pid = executions[0].pid
+        staging_order.pids = [execution.pid for execution in executions] if len(executions) > 1 else None
+        session.commit()
+
+        execution_results = yield [
+            external_program_service.wait_for_execution(execution) for execution in executions]
+        log.debug("Execution results: {}".format(execution_results))
+        return execution_results
 
     @staticmethod
     @gen.coroutine
-    def _copy_dir(staging_order_id, external_program_service, session_factory, staging_repo):
+    def _copy_dir(staging_order_id, external_program_service, session_factory, staging_repo, parallel_rsync_workers=1,
+                  staging_mode="copy"):
         """
         Copies the file or directory indicated by the staging order by calling the external_program_service.
         It will attempt the copying and update the database with the status of the StagingOrder depending on the
@@ -77,10 +223,16 @@ class StagingService(object):
         :param external_program_service: A instance of ExternalProgramService
         :param session_factory: A factory method which can produce a new sql alchemy Session instance
         :param staging_repo: A instance of DatabaseBasedStagingRepository
+        :param parallel_rsync_workers: if larger than 1, the files to stage are split over this many rsync
+                                       processes, which are run in parallel
+        :param staging_mode: if "hardlink" and the source and staging target are on the same file system, the
+                             files are hard linked into the staging target instead of being copied. If linking
+                             the files fails, they are copied instead
         :return: None, only reports back through side-effects
         """
 
         session = session_factory()
+        file_lists_dir = None
 
         # This is a somewhat hacky work-around to the problem that objects created in one
         # thread, and thus associated with another session cannot be accessed by another
@@ -88,34 +240,96 @@ class StagingService(object):
         staging_order = staging_repo.get_staging_order_by_id(staging_order_id, session)
         try:
             staging_source_with_trailing_slash = staging_order.source + "/"
-            cmd = ['rsync', '--stats', '-r', '--copy-links', '--times',
-                   staging_source_with_trailing_slash, staging_order.staging_target]
-            log.debug("Running rsync with command: {}".format(" ".join(cmd)))
-            execution = external_program_service.run(cmd)
-
-            staging_order.pid = execution.pid
-            session.commit()
-
-            execution_result = yield external_program_service.wait_for_execution(execution)
-            log.debug("Execution result: {}".format(execution_result))
-            if execution_result.status_code == 0:
-
-                # Parse the file size from the output of rsync stats:
-                # Total file size: 207,707,566 bytes
-
-                match = re.search(r'Total file size: ([\d,.]+) bytes',
-                                execution_result.stdout,
-                                re.MULTILINE)
-                size_of_transfer = match.group(1)
-                size_of_transfer = int(size_of_transfer.replace(",", "").replace(".", ""))
-                staging_order.size = size_of_transfer
+            base_cmd = ['rsync', '--stats', '-r', '--copy-links', '--times']
+            cmds = []
+            dirs_cmd = None
+            hardlink = False
+            if staging_mode == "hardlink":
+                # the source may hold symlinks to files on other file systems, so every file has to be
+                # checked. Listing the source may take a while, so do it outside of the IOLoop
+                hardlink = yield IOLoop.current().run_in_executor(
+                    None,
+                    StagingService._is_on_same_file_system,
+                    staging_order.source,
+                    staging_order.staging_target)
+                if not hardlink:
+                    log.info("Not all files of {} are on the same file system as the staging target, "
+                             "will copy them instead".format(staging_order))
+            if hardlink:
+                # hard link the files, following symlinks in the same way as rsync does with --copy-links,
+                # so that no file contents have to be copied
+                cmds = [['cp', '-R', '-L', '-l', '--preserve=timestamps',
+                         os.path.join(staging_order.source, "."), staging_order.staging_target]]
+            elif parallel_rsync_workers > 1:
+                # write the files to stage by each rsync process to a separate file list. Listing the
+                # source may take a while, so do it outside of the IOLoop
+                file_lists_dir = tempfile.mkdtemp(prefix="staging-{}-".format(staging_order_id))
+                file_lists = yield IOLoop.current().run_in_executor(
+                    None,
+                    StagingService._write_file_lists,
+                    staging_order.source,
+                    parallel_rsync_workers,
+                    file_lists_dir)
+                cmds = [
+                    base_cmd + ['--from0', '--files-from={}'.format(file_list),
+                                staging_source_with_trailing_slash, staging_order.staging_target]
+                    for file_list in file_lists]
+                if cmds:
+                    # the file lists only hold files, so the directory tree, including any empty directories, is
+                    # copied in a final pass. This also sets the times of the directories written to before
+                    dirs_cmd = base_cmd + ['--include=*/', '--exclude=*',
+                                           staging_source_with_trailing_slash, staging_order.staging_target]
+
+            # if there are no files to split, fall back to a single rsync process for the whole directory
+            if not cmds:
+                cmds = [base_cmd + [staging_source_with_trailing_slash, staging_order.staging_target]]
+
+            execution_results = yield StagingService._run_staging_commands(
+                cmds, external_program_service, staging_order, session)
+
+            if hardlink and any(execution_result.status_code != 0 for execution_result in execution_results):
+                # link(2) may fail even if the files are on the same file system, e.g. across bind mounts or
+                # when protected_hardlinks is enabled, so copy the files instead, unless the staging order
+                # was killed in the meantime
+                session.refresh(staging_order)
+                if staging_order.status == StagingStatus.staging_in_progress:
+                    log.warning("Failed to hard link the files of {}, will copy them instead".format(staging_order))
+                    yield IOLoop.current().run_in_executor(
+                        None,
+                        StagingService._clear_directory,
+                        staging_order.staging_target)
+                    hardlink = False
+                    execution_results = yield StagingService._run_staging_commands(
+                        [base_cmd + [staging_source_with_trailing_slash, staging_order.staging_target]],
+                        external_program_service,
+                        staging_order,
+                        session)
+
+            failed_execution_results = [
+                execution_result for execution_result in execution_results if execution_result.status_code != 0]
+            if dirs_cmd and not failed_execution_results:
+                dirs_execution_results = yield StagingService._run_staging_commands(
+                    [dirs_cmd], external_program_service, staging_order, session)
+                failed_execution_results = [
+                    execution_result for execution_result in dirs_execution_results
+                    if execution_result.status_code != 0]
+            if not failed_execution_results:
+                if hardlink:
+                    staging_order.size = yield IOLoop.current().run_in_executor(
+                        None,
+                        StagingService._size_of_files,
+                        staging_order.staging_target)
+                else:
+                    staging_order.size = sum(
+                        StagingService._parse_size_of_transfer(execution_result.stdout)
+                        for execution_result in execution_results)
 
                 staging_order.status = StagingStatus.staging_successful
                 log.info("Successfully staged: {} to: {}".format(staging_order, staging_order.get_staging_path()))
             else:
                 staging_order.status = StagingStatus.staging_failed
-                log.error("Failed in staging: {} because rsync returned exit code: {}".
-                         format(staging_order, execution_result.status_code))
+                log.error("Failed in staging: {} because {} returned exit code: {}".
+                         format(staging_order, "cp" if hardlink else "rsync", failed_execution_results[0].status_code))
 
         # TODO Better exception handling here...
         except Exception as e:
@@ -125,6 +339,8 @@ class StagingService(object):
         finally:
             # Always commit the state change to the database
             session.commit()
+            if file_lists_dir:
+                shutil.rmtree(file_lists_dir, ignore_errors=True)
 
     @gen.coroutine
     def stage_order(self, stage_order):
@@ -148,10 +364,13 @@ class StagingService(object):
             args_for_copy_dir = {"staging_order_id": stage_order.id,
                                  "external_program_service": self.external_program_service,
                                  "staging_repo": self.staging_repo,
-                                 "session_factory": self.session_factory}
+                                 "session_factory": self.session_factory,
+                                 "parallel_rsync_workers": self.parallel_rsync_workers,
+                                 "staging_mode": self.staging_mode}
 
-            if not self.file_system_service.exists(stage_order.staging_target):
-                self.file_system_service.makedirs(stage_order.staging_target)
+            # create the staging target unless it already exists, using a single call rather than
+            # checking for its existence first
+            self.file_system_service.makedirs(stage_order.staging_target, exist_ok=True)
 
             yield StagingService._copy_dir(**args_for_copy_dir)
 
@@ -189,6 +408,21 @@ class StagingService(object):
         else:
             return None
 
+    @staticmethod
+    def _kill_process_group(pid):
+        """
+        Send SIGTERM to the process group led by the process, e.g. to also terminate the processes spawned by
+        rsync. If the process does not lead its own process group, only the process itself is signalled, so that
+        the group of this service is never signalled.
+        :param pid: of the process to kill
+        :return: None
+        :raises OSError: if the process could not be signalled
+        """
+        if os.getpgid(pid) == pid:
+            os.killpg(pid, signal.SIGTERM)
+        else:
+            os.kill(pid, signal.SIGTERM)
+
     def kill_process_of_staging_order(self, stage_order_id):
         """
         Attempt to kill the process of the stage order.
@@ -207,7 +441,17 @@ class StagingService(object):
                 raise InvalidStatusException(
                     "Can only kill processes where the staging order is 'staging_in_progress'")
 
-            os.kill(stage_order.pid, signal.SIGTERM)
+            # a staging order may be carried out by several rsync processes, some of which may
+            # already have finished, so only fail if none of them could be killed
+            pids = stage_order.pids or [stage_order.pid]
+            kill_errors = []
+            for pid in pids:
+                try:
+                    StagingService._kill_process_group(pid)
+                except OSError as e:
+                    kill_errors.append(e)
+            if len(kill_errors) == len(pids):
+                raise kill_errors[0]
 
         except OSError:
             log.error("Failed to kill process with pid: {} associated with staging order: {} ".
@@ -21,6 +21,7 @@ setup(
     author='SNP&SEQ Technology Platform, Uppsala University',
     packages=find_packages(),
     include_package_data=True,
+    python_requires='>=3.6',
     entry_points={
         'console_scripts': ['delivery-ws = delivery.app:start']
     },
@@ -2,11 +2,13 @@ import os
 import json
 import mock
 import random
+import time
 import logging
 
 
 from subprocess import PIPE, run as subprocess_run
 
+from tornado import gen
 from tornado.testing import *
 from tornado.web import Application
 
@@ -14,6 +16,7 @@ from arteria.web.app import AppService
 
 from delivery.app import routes as app_routes, compose_application
 from delivery.services.metadata_service import MetadataService
+from delivery.models.db_models import StagingStatus, DeliveryStatus
 from delivery.models.execution import Execution
 
 from tests.test_utils import samplesheet_file_from_runfolder
@@ -30,13 +33,54 @@ class BaseIntegration(AsyncHTTPTestCase):
         # Default duration of mock delivery
         self.mock_duration = 0.1
 
-    def _create_projects_dir_with_random_data(self, base_dir, proj_name='ABC_123', runfolder_name=None):
+    def _create_projects_dir_with_data(self, base_dir, proj_name='ABC_123', runfolder_name=None):
         tmp_proj_dir = os.path.join(base_dir, 'Projects', proj_name)
         if runfolder_name:
             tmp_proj_dir = os.path.join(tmp_proj_dir, runfolder_name)
         os.makedirs(tmp_proj_dir)
+        # only the size of the file is checked, so its contents need not be random
         with open(os.path.join(tmp_proj_dir, 'test_file'), 'wb') as f:
-            f.write(os.urandom(1024))
+            f.write(bytes(1024))
+
+    @gen.coroutine
+    def _wait_for_staging_status(self, link, timeout=5, delay=0.05):
+        """
+        Poll the status of a staging order until it is no longer pending or in progress, or until the timeout is
+        reached
+        :param link: to the status of the staging order
+        :param timeout: the maximum number of seconds to poll for
+        :param delay: the number of seconds to wait between polls
+        :return: the last polled status response of the staging order, as parsed json
+        """
+        unfinished_statuses = (StagingStatus.pending.name, StagingStatus.staging_in_progress.name)
+        start_time = time.time()
+        while True:
+            status_response = yield self.http_client.fetch(link)
+            status_response_json = json.loads(status_response.body)
+            if status_response_json["status"] not in unfinished_statuses or time.time() - start_time > timeout:
+                return status_response_json
+            yield gen.sleep(delay)
+
+    @gen.coroutine
+    def _wait_for_delivery_status(self, link, timeout=5, delay=0.025, max_delay=0.2):
+        """
+        Poll the status of a delivery order until it is no longer pending or in progress, or until the timeout is
+        reached. The time between polls is doubled after each poll, up to a maximum.
+        :param link: to the status of the delivery order
+        :param timeout: the maximum number of seconds to poll for
+        :param delay: the number of seconds to wait before the second poll
+        :param max_delay: the maximum number of seconds to wait between polls
+        :return: the last polled status of the delivery order
+        """
+        unfinished_statuses = (DeliveryStatus.pending.name, DeliveryStatus.delivery_in_progress.name)
+        start_time = time.time()
+        while True:
+            status_response = yield self.http_client.fetch(link)
+            status = json.loads(status_response.body)["status"]
+            if status not in unfinished_statuses or time.time() - start_time > timeout:
+                return status
+            yield gen.sleep(delay)
+            delay = min(delay * 2, max_delay)
 
     @staticmethod
     def _create_checksums_file(base_dir, checksums=None):
@@ -54,19 +98,37 @@ class BaseIntegration(AsyncHTTPTestCase):
                 yield state
                 state = not state
 
-        def _touch_file(file_path):
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'wb') as f:
-                f.write(os.urandom(1024))
+        # the file contents are not inspected, so the same random data can be written to all files
+        random_data = os.urandom(1024)
+
+        def _touch_file(file_name, dir_fd):
+            fd = os.open(file_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+            try:
+                os.write(fd, random_data)
+            finally:
+                os.close(fd)
 
         os.makedirs(runfolder.path, exist_ok=True)
+        file_names_by_dir = {}
         for project in runfolder.projects:
             os.makedirs(project.path)
             for sample in project.samples:
                 for sample_file in sample.sample_files:
-                    _touch_file(sample_file.file_path)
+                    file_names_by_dir.setdefault(
+                        os.path.dirname(sample_file.file_path), []).append(sample_file.file_name)
             for report_file in project.project_files:
-                _touch_file(report_file.file_path)
+                file_names_by_dir.setdefault(
+                    os.path.dirname(report_file.file_path), []).append(report_file.file_name)
+
+        # create each directory once and the files in it relative to the open directory
+        for file_dir, file_names in file_names_by_dir.items():
+            os.makedirs(file_dir, exist_ok=True)
+            dir_fd = os.open(file_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                for file_name in file_names:
+                    _touch_file(file_name, dir_fd)
+            finally:
+                os.close(dir_fd)
 
         checksum_file = os.path.join(runfolder.path, "MD5", "checksums.md5")
         os.mkdir(os.path.dirname(checksum_file))
@@ -75,23 +137,46 @@ class BaseIntegration(AsyncHTTPTestCase):
 
     API_BASE = "/api/1.0"
 
-    def get_app(self):
+    @classmethod
+    def _get_routes(cls):
+        """
+        Composing the application reads the config and sets up the database, so only do it once per
+        test class and reuse the routes for each test
+        """
+        if "_routes" not in cls.__dict__:
+            # Get an as similar app as possible, tough note that we don't use the
+            #  app service start method to start up the the application
+            path_to_this_file = os.path.abspath(
+                os.path.dirname(os.path.realpath(__file__)))
+            app_svc = AppService.create(
+                    product_name="test_delivery_service",
+                    config_root="{}/../../config/".format(path_to_this_file),
+                    args=[])
+
+            config = app_svc.config_svc
+            composed_application = compose_application(config)
+            cls._routes = app_routes(**composed_application)
+            cls._staging_directory = config["staging_directory"]
+        return cls._routes
+
+    @gen.coroutine
+    def _stage_runfolder(self, runfolder_name):
+        """
+        Request staging of a runfolder and check that the request was accepted
+        :param runfolder_name: the name of the runfolder to stage
+        :return: the parsed json response
+        """
+        url = "/".join([self.API_BASE, "stage", "runfolder", runfolder_name])
+        response = yield self.http_client.fetch(self.get_url(url), method='POST', body='')
+        self.assertEqual(response.code, 202)
+        return json.loads(response.body)
 
-        # Get an as similar app as possible, tough note that we don't use the
-        #  app service start method to start up the the application
-        path_to_this_file = os.path.abspath(
-            os.path.dirname(os.path.realpath(__file__)))
-        app_svc = AppService.create(
-                product_name="test_delivery_service",
-                config_root="{}/../../config/".format(path_to_this_file),
-                args=[])
+    def get_app(self):
 
-        config = app_svc.config_svc
-        composed_application = compose_application(config)
-        routes = app_routes(**composed_application)
+        routes = self._get_routes()
 
         if self.mock_delivery:
-            def mock_delivery(cmd):
+            def mock_delivery(cmd, **kwargs):
                 project_id = f"snpseq{random.randint(0, 10**10):010d}"
                 log.debug(f"Mock is called with {cmd}")
                 shell = False
@@ -141,7 +226,8 @@ class BaseIntegration(AsyncHTTPTestCase):
                                stdout=PIPE,
                                stderr=PIPE,
                                stdin=PIPE,
-                               shell=shell)
+                               shell=shell,
+                               **kwargs)
                 return Execution(pid=p.pid, process_obj=p)
 
             self.patcher = mock.patch(
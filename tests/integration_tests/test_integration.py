@@ -1,7 +1,6 @@
 
 
 import json
-import sys
 import tempfile
 
 from tornado.testing import *
@@ -11,18 +10,6 @@ from delivery.services.metadata_service import MetadataService
 from tests.integration_tests.base import BaseIntegration
 from tests.test_utils import unorganised_runfolder
 
-class TestPythonVersion(unittest.TestCase):
-    """
-    Ensure the python binary is of a compatible version
-    """
-    REQUIRED_MAJOR_VERSION = 3
-    REQUIRED_MINOR_VERSION = 6
-
-    def test_python_binary_version(self):
-        self.assertEqual(TestPythonVersion.REQUIRED_MAJOR_VERSION, sys.version_info.major)
-        self.assertLessEqual(TestPythonVersion.REQUIRED_MINOR_VERSION, sys.version_info.minor)
-
-
 class TestIntegration(BaseIntegration):
     def test_can_return_flowcells(self):
         response = self.fetch(self.API_BASE + "/runfolders")
@@ -77,17 +64,11 @@ class TestIntegration(BaseIntegration):
                 for f in (checksum_file, samplesheet_file):
                     self.assertTrue(os.path.exists(f))
 
-                checksums = MetadataService.parse_checksum_file(checksum_file)
-
-                def _verify_checksum(file_path, expected_checksum):
-                    self.assertIn(file_path, checksums)
-                    self.assertEqual(checksums[file_path], expected_checksum)
-
-                _verify_checksum(
+                # collect the expected checksums and compare them to the checksum file in one go
+                expected_checksums = {
                     os.path.join(
                         runfolder.name,
-                        os.path.basename(samplesheet_file)),
-                    MetadataService.hash_file(samplesheet_file))
+                        os.path.basename(samplesheet_file)): MetadataService.hash_file(samplesheet_file)}
 
                 for project_file in project.project_files:
                     project_file_base = os.path.dirname(project.project_files[0].file_path)
@@ -96,7 +77,7 @@ class TestIntegration(BaseIntegration):
                     self.assertEqual(
                         os.path.basename(organised_project_file_path),
                         project_file.file_name)
-                    _verify_checksum(os.path.join(runfolder.name, relative_path), project_file.checksum)
+                    expected_checksums[os.path.join(runfolder.name, relative_path)] = project_file.checksum
                 for sample in project.samples:
                     sample_path = os.path.join(organised_path, sample.sample_id)
                     self.assertTrue(os.path.exists(sample_path))
@@ -107,7 +88,12 @@ class TestIntegration(BaseIntegration):
                         relative_file_path = os.path.join(
                             runfolder.name,
                             os.path.relpath(organised_file_path, organised_path))
-                        _verify_checksum(relative_file_path, sample_file.checksum)
+                        expected_checksums[relative_file_path] = sample_file.checksum
+
+                checksums = MetadataService.parse_checksum_file(checksum_file)
+                self.assertDictEqual(
+                    expected_checksums,
+                    {file_path: checksums.get(file_path) for file_path in expected_checksums})
 
     def test_cannot_stage_the_same_runfolder_twice(self):
         # Note that this is a test which skips delivery (since to_outbox is not
@@ -116,7 +102,7 @@ class TestIntegration(BaseIntegration):
         with tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/', prefix='160930_ST-E00216_0111_BH37CWALXX_') as tmp_dir:
 
             dir_name = os.path.basename(tmp_dir)
-            self._create_projects_dir_with_random_data(tmp_dir)
+            self._create_projects_dir_with_data(tmp_dir)
             self._create_checksums_file(tmp_dir)
 
             url = "/".join([self.API_BASE, "stage", "runfolder", dir_name])
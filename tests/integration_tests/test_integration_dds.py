@@ -3,6 +3,9 @@ import json
 import time
 import tempfile
 
+from contextlib import contextmanager
+
+from tornado import gen
 from tornado.testing import *
 
 from delivery.models.db_models import StagingStatus, DeliveryStatus
@@ -10,7 +13,49 @@ from delivery.models.db_models import StagingStatus, DeliveryStatus
 from tests.integration_tests.base import BaseIntegration
 from tests.test_utils import unorganised_runfolder
 
+CLEAN_DELIVERY_MODE_PAYLOAD = json.dumps({'delivery_mode': 'CLEAN'})
+BATCH_DELIVERY_MODE_PAYLOAD = json.dumps({'delivery_mode': 'BATCH'})
+FORCE_DELIVERY_MODE_PAYLOAD = json.dumps({'delivery_mode': 'FORCE'})
+
+CREATE_PROJECT_PAYLOAD = json.dumps({
+    "description": "Dummy project",
+    "pi": "alex@doe.com",
+    "researchers": ["robin@doe.com", "kim@doe.com"],
+    "owners": ["alex@doe.com"],
+    "auth_token": '1234',
+})
+
 class TestIntegrationDDS(BaseIntegration):
+    @contextmanager
+    def _two_runfolder_dirs(self, project=None):
+        """
+        Create two temporary runfolder directories, with data for a project if one is given
+        :param project: name of the project to create data for in each runfolder, if any
+        :return: the paths to the two runfolder directories
+        """
+        with tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
+                                         prefix='160930_ST-E00216_0555_BH37CWALXX_') as tmpdir1, \
+                tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
+                                            prefix='160930_ST-E00216_0556_BH37CWALXX_') as tmpdir2:
+            if project:
+                for tmpdir in (tmpdir1, tmpdir2):
+                    self._create_projects_dir_with_data(tmpdir, project, os.path.basename(tmpdir))
+            yield tmpdir1, tmpdir2
+
+    def _deliver_staging_orders(self, staging_order_project_and_id, delivery_body):
+        """
+        Request delivery of a number of staging orders concurrently
+        :param staging_order_project_and_id: a dict mapping project names to staging order ids
+        :param delivery_body: the body to post with each delivery request
+        :return: a future resolving to a dict mapping project names to delivery responses
+        """
+        return gen.multi({
+            project: self.http_client.fetch(
+                self.get_url('/'.join([self.API_BASE, 'deliver', 'stage_id', str(staging_id)])),
+                method='POST',
+                body=json.dumps(delivery_body))
+            for project, staging_id in staging_order_project_and_id.items()})
+
     @gen_test
     def test_can_stage_and_delivery_runfolder(self):
         # Note that this is a test which skips delivery (since to_outbox is not
@@ -21,50 +66,42 @@ class TestIntegrationDDS(BaseIntegration):
                 prefix='160930_ST-E00216_0111_BH37CWALXX_') as tmp_dir:
 
             dir_name = os.path.basename(tmp_dir)
-            self._create_projects_dir_with_random_data(tmp_dir)
+            self._create_projects_dir_with_data(tmp_dir)
             self._create_checksums_file(tmp_dir)
 
-            url = "/".join([self.API_BASE, "stage", "runfolder", dir_name])
-            response = yield self.http_client.fetch(self.get_url(url), method='POST', body='')
-            self.assertEqual(response.code, 202)
-
-            response_json = json.loads(response.body)
+            response_json = yield self._stage_runfolder(dir_name)
 
             staging_status_links = response_json.get("staging_order_links")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
-
-            for project, link in staging_status_links.items():
+            # wait for staging to complete, rather than pausing for a fixed time
+            status_responses = yield gen.multi(
+                {project: self._wait_for_staging_status(link) for project, link in staging_status_links.items()})
 
+            for project, status_response_json in status_responses.items():
                 self.assertEqual(project, "ABC_123")
-
-                status_response = yield self.http_client.fetch(link)
-                self.assertEqual(json.loads(status_response.body)["status"], StagingStatus.staging_successful.name)
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
                 # The size of the fake project is 1024 bytes
-                status_response = yield self.http_client.fetch(link)
-                self.assertEqual(json.loads(status_response.body)["size"], 1024)
+                self.assertEqual(status_response_json["size"], 1024)
 
             staging_order_project_and_id = response_json.get("staging_order_ids")
 
             for project, staging_id in staging_order_project_and_id.items():
-                self.assertTrue(os.path.exists(f"/tmp/{staging_id}/{project}"))
-                delivery_url = '/'.join([self.API_BASE, 'deliver', 'stage_id', str(staging_id)])
-                delivery_body = {
-                        'delivery_project_id': 'snpseq00025',
-                        'ngi_project_name': 'AB-1234',
-                        'auth_token': '1234',
-                        'skip_delivery': True,
-                        }
-                delivery_resp = yield self.http_client.fetch(
-                        self.get_url(delivery_url),
-                        method='POST',
-                        body=json.dumps(delivery_body))
-                delivery_resp_as_json = json.loads(delivery_resp.body)
-                delivery_link = delivery_resp_as_json['delivery_order_link']
+                self.assertTrue(os.path.exists(os.path.join(self._staging_directory, str(staging_id), project)))
+
+            delivery_body = {
+                    'delivery_project_id': 'snpseq00025',
+                    'ngi_project_name': 'AB-1234',
+                    'auth_token': '1234',
+                    'skip_delivery': True,
+                    }
+            delivery_responses = yield self._deliver_staging_orders(staging_order_project_and_id, delivery_body)
+
+            status_responses = yield gen.multi({
+                project: self.http_client.fetch(json.loads(delivery_resp.body)['delivery_order_link'])
+                for project, delivery_resp in delivery_responses.items()})
 
-                status_response = yield self.http_client.fetch(delivery_link)
+            for project, status_response in status_responses.items():
                 self.assertEqual(json.loads(status_response.body)["status"], DeliveryStatus.delivery_skipped.name)
 
     @gen_test
@@ -83,95 +120,81 @@ class TestIntegrationDDS(BaseIntegration):
 
             staging_status_links = response_json.get("staging_order_links")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
+            # wait for staging to complete, rather than pausing for a fixed time
+            status_responses = yield gen.multi(
+                {project: self._wait_for_staging_status(link) for project, link in staging_status_links.items()})
 
-            for project, link in staging_status_links.items():
+            for project, status_response_json in status_responses.items():
                 self.assertEqual(project, dir_name)
-
-                status_response = yield self.http_client.fetch(link)
-                self.assertEqual(json.loads(status_response.body)["status"], StagingStatus.staging_successful.name)
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
             staging_order_project_and_id = response_json.get("staging_order_ids")
 
-            for project, staging_id in staging_order_project_and_id.items():
-                delivery_url = '/'.join([self.API_BASE, 'deliver', 'stage_id', str(staging_id)])
-                delivery_body = {
-                        'delivery_project_id': 'snpseq00025',
-                        'ngi_project_name': 'AB-1234',
-                        'skip_delivery': True,
-                        'dds': True,
-                        'auth_token': '1234',
-                        }
-                delivery_resp = yield self.http_client.fetch(self.get_url(delivery_url), method='POST', body=json.dumps(delivery_body))
-                delivery_resp_as_json = json.loads(delivery_resp.body)
-                delivery_link = delivery_resp_as_json['delivery_order_link']
-
-                status_response = yield self.http_client.fetch(delivery_link)
+            delivery_body = {
+                    'delivery_project_id': 'snpseq00025',
+                    'ngi_project_name': 'AB-1234',
+                    'skip_delivery': True,
+                    'dds': True,
+                    'auth_token': '1234',
+                    }
+            delivery_responses = yield self._deliver_staging_orders(staging_order_project_and_id, delivery_body)
+            delivery_resps_as_json = {
+                project: json.loads(delivery_resp.body) for project, delivery_resp in delivery_responses.items()}
+
+            status_responses = yield gen.multi({
+                project: self.http_client.fetch(delivery_resp_as_json['delivery_order_link'])
+                for project, delivery_resp_as_json in delivery_resps_as_json.items()})
+
+            for project, status_response in status_responses.items():
                 self.assertEqual(json.loads(status_response.body)["status"], DeliveryStatus.delivery_skipped.name)
-                
-                dds_version = delivery_resp_as_json['dds_version']
+
+                dds_version = delivery_resps_as_json[project]['dds_version']
                 self.assertEqual(dds_version, '2.6.1')
 
     @gen_test
     def test_can_stage_and_deliver_clean_flowcells(self):
-        with tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                         prefix='160930_ST-E00216_0555_BH37CWALXX_') as tmpdir1,\
-             tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                         prefix='160930_ST-E00216_0556_BH37CWALXX_') as tmpdir2:
-                self._create_projects_dir_with_random_data(tmpdir1, 'XYZ_123', os.path.basename(tmpdir1))
-                self._create_projects_dir_with_random_data(tmpdir2, 'XYZ_123', os.path.basename(tmpdir2))
-
-                url = "/".join([self.API_BASE, "stage", "project", 'runfolders', 'XYZ_123'])
-                payload = {'delivery_mode': 'CLEAN'}
-                response = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload))
-                self.assertEqual(response.code, 202)
+        with self._two_runfolder_dirs('XYZ_123'):
+            url = "/".join([self.API_BASE, "stage", "project", 'runfolders', 'XYZ_123'])
+            response = yield self.http_client.fetch(self.get_url(url), method='POST', body=CLEAN_DELIVERY_MODE_PAYLOAD)
+            self.assertEqual(response.code, 202)
 
-                payload = {'delivery_mode': 'CLEAN'}
-                response_failed = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload), raise_error=False)
-                self.assertEqual(response_failed.code, 403)
+            response_failed = yield self.http_client.fetch(self.get_url(url), method='POST', body=CLEAN_DELIVERY_MODE_PAYLOAD, raise_error=False)
+            self.assertEqual(response_failed.code, 403)
 
-                response_json = json.loads(response.body)
+            response_json = json.loads(response.body)
 
-                staging_status_links = response_json.get("staging_order_links")
+            staging_status_links = response_json.get("staging_order_links")
 
-                for project, link in staging_status_links.items():
-                    self.assertEqual(project, 'XYZ_123')
+            # wait for staging to complete, rather than pausing for a fixed time
+            status_responses = yield gen.multi(
+                {project: self._wait_for_staging_status(link) for project, link in staging_status_links.items()})
 
-                    status_response = yield self.http_client.fetch(link)
-                    self.assertEqual(json.loads(status_response.body)["status"], StagingStatus.staging_successful.name)
+            for project, status_response_json in status_responses.items():
+                self.assertEqual(project, 'XYZ_123')
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
     @gen_test
     def test_can_stage_and_deliver_batch_flowcells(self):
-        with tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                         prefix='160930_ST-E00216_0555_BH37CWALXX_') as tmpdir1, \
-                tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                            prefix='160930_ST-E00216_0556_BH37CWALXX_') as tmpdir2:
-            self._create_projects_dir_with_random_data(tmpdir1, 'XYZ_123', os.path.basename(tmpdir1))
-            self._create_projects_dir_with_random_data(tmpdir2, 'XYZ_123', os.path.basename(tmpdir2))
-
+        with self._two_runfolder_dirs('XYZ_123'):
             url = "/".join([self.API_BASE, "stage", "project", 'runfolders', 'XYZ_123'])
-            payload = {'delivery_mode': 'BATCH'}
-            response = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload))
+            response = yield self.http_client.fetch(self.get_url(url), method='POST', body=BATCH_DELIVERY_MODE_PAYLOAD)
 
             self.assertEqual(response.code, 202)
 
-            payload = {'delivery_mode': 'BATCH'}
-            response_failed = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload), raise_error=False)
+            response_failed = yield self.http_client.fetch(self.get_url(url), method='POST', body=BATCH_DELIVERY_MODE_PAYLOAD, raise_error=False)
             self.assertEqual(response_failed.code, 403)
 
             response_json = json.loads(response.body)
 
             staging_status_links = response_json.get("staging_order_links")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
+            # poll until staging has completed, rather than pausing for a fixed time
+            status_responses = yield gen.multi(
+                {project: self._wait_for_staging_status(link) for project, link in staging_status_links.items()})
 
-            for project, link in staging_status_links.items():
+            for project, status_response_json in status_responses.items():
                 self.assertEqual(project, 'XYZ_123')
-
-                status_response = yield self.http_client.fetch(link)
-                self.assertEqual(json.loads(status_response.body)["status"], StagingStatus.staging_successful.name)
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
     def create_unorganised_test_runfolders(self, tmpdir):
             return unorganised_runfolder(
@@ -181,48 +204,35 @@ class TestIntegrationDDS(BaseIntegration):
     
     @gen_test
     def test_can_stage_and_deliver_force_flowcells(self):
-        with tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                         prefix='160930_ST-E00216_0555_BH37CWALXX_') as tmpdir1, \
-                tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                            prefix='160930_ST-E00216_0556_BH37CWALXX_') as tmpdir2:
-            self._create_projects_dir_with_random_data(tmpdir1, 'XYZ_123', os.path.basename(tmpdir1))
-            self._create_projects_dir_with_random_data(tmpdir2, 'XYZ_123', os.path.basename(tmpdir2))
-
+        with self._two_runfolder_dirs('XYZ_123'):
             # First just stage it
             url = "/".join([self.API_BASE, "stage", "project", 'runfolders', 'XYZ_123'])
-            payload = {'delivery_mode': 'BATCH'}
-            response = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload))
+            response = yield self.http_client.fetch(self.get_url(url), method='POST', body=BATCH_DELIVERY_MODE_PAYLOAD)
             self.assertEqual(response.code, 202)
 
             # The it should be denied (since if has already been staged)
-            payload = {'delivery_mode': 'BATCH'}
-            response_failed = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload), raise_error=False)
+            response_failed = yield self.http_client.fetch(self.get_url(url), method='POST', body=BATCH_DELIVERY_MODE_PAYLOAD, raise_error=False)
             self.assertEqual(response_failed.code, 403)
 
             # Then it should work once force is specified.
-            payload = {'delivery_mode': 'FORCE'}
-            response_forced = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload))
+            response_forced = yield self.http_client.fetch(self.get_url(url), method='POST', body=FORCE_DELIVERY_MODE_PAYLOAD)
             self.assertEqual(response_forced.code, 202)
 
             response_json = json.loads(response_forced.body)
 
             staging_status_links = response_json.get("staging_order_links")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
+            # wait for staging to complete, rather than pausing for a fixed time
+            status_responses = yield gen.multi(
+                {project: self._wait_for_staging_status(link) for project, link in staging_status_links.items()})
 
-            for project, link in staging_status_links.items():
+            for project, status_response_json in status_responses.items():
                 self.assertEqual(project, 'XYZ_123')
-
-                status_response = yield self.http_client.fetch(link)
-                self.assertEqual(json.loads(status_response.body)["status"], StagingStatus.staging_successful.name)
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
     @gen_test
     def test_can_organise_stage_and_deliver_force_flowcells(self):
-        with tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                         prefix='160930_ST-E00216_0555_BH37CWALXX_') as tmpdir1, \
-                tempfile.TemporaryDirectory(dir='./tests/resources/runfolders/',
-                                            prefix='160930_ST-E00216_0556_BH37CWALXX_') as tmpdir2:
+        with self._two_runfolder_dirs() as (tmpdir1, tmpdir2):
             # First organise
             unorganised_runfolder1 = self.create_unorganised_test_runfolders(tmpdir1)
             unorganised_runfolder2 = self.create_unorganised_test_runfolders(tmpdir2)
@@ -240,8 +250,7 @@ class TestIntegrationDDS(BaseIntegration):
  
             # Then stage it
             url = "/".join([self.API_BASE, "stage", "project", 'runfolders', 'JKL_123'])
-            payload = {'delivery_mode': 'FORCE'}
-            response_forced = yield self.http_client.fetch(self.get_url(url), method='POST', body=json.dumps(payload))
+            response_forced = yield self.http_client.fetch(self.get_url(url), method='POST', body=FORCE_DELIVERY_MODE_PAYLOAD)
             self.assertEqual(response_forced.code, 202)
 
             response_json = json.loads(response_forced.body)
@@ -249,17 +258,16 @@ class TestIntegrationDDS(BaseIntegration):
             staging_status_links = response_json.get("staging_order_links")
             staging_order_ids = response_json.get("staging_order_ids")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
+            # wait for staging to complete, rather than pausing for a fixed time
+            status_responses = yield gen.multi(
+                {project: self._wait_for_staging_status(link) for project, link in staging_status_links.items()})
 
-            for project, link in staging_status_links.items():
+            for project, status_response_json in status_responses.items():
                 self.assertEqual(project, 'JKL_123')
-
-                status_response = yield self.http_client.fetch(link)
-                self.assertEqual(json.loads(status_response.body)["status"], StagingStatus.staging_successful.name)
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
             # Assert the staged folder structure has only one runfolder folder
-            temp_staging_dir = f"/tmp/{staging_order_ids.get('JKL_123')}/JKL_123"
+            temp_staging_dir = os.path.join(self._staging_directory, str(staging_order_ids.get('JKL_123')), 'JKL_123')
             for runfolder in os.listdir(temp_staging_dir):
                 self.assertFalse(runfolder in os.listdir(f"{temp_staging_dir}/{runfolder}"))
 
@@ -267,17 +275,10 @@ class TestIntegrationDDS(BaseIntegration):
     def test_can_create_project(self):
         project_name = "CD-1234"
         url = "/".join([self.API_BASE, "dds_project", "create", project_name])
-        payload = {
-            "description": "Dummy project",
-            "pi": "alex@doe.com",
-            "researchers": ["robin@doe.com", "kim@doe.com"],
-            "owners": ["alex@doe.com"],
-            "auth_token": '1234',
-        }
 
         response = yield self.http_client.fetch(
                 self.get_url(url), method='POST',
-                body=json.dumps(payload))
+                body=CREATE_PROJECT_PAYLOAD)
 
         self.assertEqual(response.code, 202)
         self.assertTrue(json.loads(response.body)["dds_project_id"].startswith("snpseq"))
@@ -286,25 +287,14 @@ class TestIntegrationDDS(BaseIntegration):
     def test_can_create_two_projects(self):
         project_name = "CD-1234"
         url = "/".join([self.API_BASE, "dds_project", "create", project_name])
-        payload = {
-            "description": "Dummy project",
-            "pi": "alex@doe.com",
-            "researchers": ["robin@doe.com", "kim@doe.com"],
-            "owners": ["alex@doe.com"],
-            "auth_token": '1234',
-        }
 
-        response = yield self.http_client.fetch(
-                self.get_url(url), method='POST',
-                body=json.dumps(payload))
-        self.assertEqual(response.code, 202)
-        dds_project_id1 = json.loads(response.body)["dds_project_id"]
+        responses = yield gen.multi([
+            self.http_client.fetch(self.get_url(url), method='POST', body=CREATE_PROJECT_PAYLOAD)
+            for _ in range(2)])
 
-        response = yield self.http_client.fetch(
-                self.get_url(url), method='POST',
-                body=json.dumps(payload))
-        self.assertEqual(response.code, 202)
-        dds_project_id2 = json.loads(response.body)["dds_project_id"]
+        for response in responses:
+            self.assertEqual(response.code, 202)
+        dds_project_id1, dds_project_id2 = (json.loads(response.body)["dds_project_id"] for response in responses)
 
         self.assertNotEqual(dds_project_id1, dds_project_id2)
 
@@ -322,21 +312,15 @@ class TestIntegrationDDSShortWait(BaseIntegration):
                 prefix='160930_ST-E00216_0111_BH37CWALXX_') as tmp_dir:
 
             dir_name = os.path.basename(tmp_dir)
-            self._create_projects_dir_with_random_data(tmp_dir)
+            self._create_projects_dir_with_data(tmp_dir)
             self._create_checksums_file(tmp_dir)
 
-            url = "/".join([self.API_BASE, "stage", "runfolder", dir_name])
-            response = yield self.http_client.fetch(
-                    self.get_url(url),
-                    method='POST',
-                    body='')
-
-            response_json = json.loads(response.body)
+            response_json = yield self._stage_runfolder(dir_name)
 
             staging_order_project_and_id = response_json.get("staging_order_ids")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
+            # wait for staging to complete, rather than pausing for a fixed time
+            yield gen.multi([self._wait_for_staging_status(link) for link in response_json.get("staging_order_links").values()])
 
             for project, staging_id in staging_order_project_and_id.items():
                 delivery_url = '/'.join([
@@ -359,15 +343,8 @@ class TestIntegrationDDSShortWait(BaseIntegration):
                 delivery_resp_as_json = json.loads(delivery_resp.body)
                 delivery_link = delivery_resp_as_json['delivery_order_link']
 
-                while True:
-                    # Insert a pause to allow delivery to complete
-                    time.sleep(1)
-
-                    status_response = yield self.http_client.fetch(
-                            delivery_link)
-                    if (json.loads(status_response.body)["status"]
-                            == DeliveryStatus.delivery_successful.name):
-                        break
+                status = yield self._wait_for_delivery_status(delivery_link, timeout=self.mock_duration + 5)
+                self.assertEqual(status, DeliveryStatus.delivery_successful.name)
 
                 stop = time.time()
                 self.assertTrue(stop - start >= self.mock_duration)
@@ -379,29 +356,18 @@ class TestIntegrationDDSShortWait(BaseIntegration):
                 prefix='160930_ST-E00216_0111_BH37CWALXX_') as tmp_dir:
 
             dir_name = os.path.basename(tmp_dir)
-            self._create_projects_dir_with_random_data(tmp_dir)
+            self._create_projects_dir_with_data(tmp_dir)
             self._create_checksums_file(tmp_dir)
 
-            url = "/".join([self.API_BASE, "stage", "runfolder", dir_name])
-            response = yield self.http_client.fetch(
-                    self.get_url(url),
-                    method='POST',
-                    body='')
-
-            response_json = json.loads(response.body)
+            response_json = yield self._stage_runfolder(dir_name)
 
             staging_order_project_and_id = response_json.get("staging_order_ids")
             staging_status_links = response_json.get("staging_order_links")
 
             for project, link in staging_status_links.items():
                 staging_id = staging_order_project_and_id[project]
-                while True:
-                    # Insert a pause to allow staging to complete
-                    time.sleep(1)
-                    status_response = yield self.http_client.fetch(link)
-                    if json.loads(status_response.body)["status"] == \
-                            StagingStatus.staging_successful.name:
-                        break
+                status_response_json = yield self._wait_for_staging_status(link)
+                self.assertEqual(status_response_json["status"], StagingStatus.staging_successful.name)
 
                 delivery_url = '/'.join([
                     self.API_BASE, 'deliver', 'stage_id', str(staging_id)])
@@ -421,17 +387,8 @@ class TestIntegrationDDSShortWait(BaseIntegration):
                 delivery_resp_as_json = json.loads(delivery_resp.body)
                 delivery_link = delivery_resp_as_json['delivery_order_link']
 
-                while True:
-                    # Insert a pause to allow delivery to complete
-                    time.sleep(1)
-                    status_response = yield self.http_client.fetch(
-                            delivery_link)
-                    if (json.loads(status_response.body)["status"]
-                            == DeliveryStatus.delivery_successful.name):
-                        break
-                    elif (json.loads(status_response.body)["status"]
-                            == DeliveryStatus.delivery_failed.name):
-                        raise Exception("Delivery failed")
+                status = yield self._wait_for_delivery_status(delivery_link)
+                self.assertEqual(status, DeliveryStatus.delivery_successful.name)
 
 
 class TestIntegrationDDSLongWait(BaseIntegration):
@@ -452,20 +409,16 @@ class TestIntegrationDDSLongWait(BaseIntegration):
                 prefix='160930_ST-E00216_0111_BH37CWALXX_') as tmp_dir:
 
             dir_name = os.path.basename(tmp_dir)
-            self._create_projects_dir_with_random_data(tmp_dir)
+            self._create_projects_dir_with_data(tmp_dir)
             self._create_checksums_file(tmp_dir)
 
-            url = "/".join([self.API_BASE, "stage", "runfolder", dir_name])
-            response = yield self.http_client.fetch(
-                    self.get_url(url), method='POST', body='')
-
-            response_json = json.loads(response.body)
+            response_json = yield self._stage_runfolder(dir_name)
 
             staging_order_project_and_id = response_json.get(
                     "staging_order_ids")
 
-            # Insert a pause to allow staging to complete
-            time.sleep(1)
+            # wait for staging to complete, rather than pausing for a fixed time
+            yield gen.multi([self._wait_for_staging_status(link) for link in response_json.get("staging_order_links").values()])
 
             for project, staging_id in staging_order_project_and_id.items():
                 delivery_url = '/'.join([
@@ -494,17 +447,10 @@ class TestIntegrationDDSUnmocked(BaseIntegration):
     def test_responds_with_dummy_token(self):
         project_name = "CD-1234"
         url = "/".join([self.API_BASE, "dds_project", "create", project_name])
-        payload = {
-            "description": "Dummy project",
-            "pi": "alex@doe.com",
-            "researchers": ["robin@doe.com", "kim@doe.com"],
-            "owners": ["alex@doe.com"],
-            "auth_token": '1234',
-        }
 
         response = yield self.http_client.fetch(
                 self.get_url(url), method='POST',
-                body=json.dumps(payload),
+                body=CREATE_PROJECT_PAYLOAD,
                 raise_error=False,
                 )
 
@@ -1,4 +1,6 @@
 
+import mock
+import os
 import shutil
 import tempfile
 import unittest
@@ -34,3 +36,107 @@ class TestFileSystemService(unittest.TestCase):
             sorted(self.files),
             sorted(list(FileSystemService().list_files_recursively(self.rootdir)))
         )
+
+    def test_list_files_recursively_does_not_follow_dir_symlinks(self):
+        os.symlink(self.dirs[0], os.path.join(self.rootdir, "link-to-dir"))
+        os.symlink(self.files[0], os.path.join(self.rootdir, "link-to-file"))
+        self.assertListEqual(
+            sorted(self.files + [os.path.join(self.rootdir, "link-to-file")]),
+            sorted(list(FileSystemService().list_files_recursively(self.rootdir)))
+        )
+
+    def test_list_files_recursively_missing_dir(self):
+        self.assertListEqual(
+            [],
+            list(FileSystemService().list_files_recursively(os.path.join(self.rootdir, "missing")))
+        )
+
+    def test_list_directory_entries(self):
+        self.assertSetEqual(
+            set(map(os.path.basename, self.dirs[:2] + self.files[:3])),
+            FileSystemService.list_directory_entries(self.rootdir))
+        self.assertSetEqual(
+            set(),
+            FileSystemService.list_directory_entries(os.path.join(self.rootdir, "missing")))
+
+    def test_makedirs_batch(self):
+        paths = [
+            os.path.join(self.rootdir, "a", "b", "c"),
+            os.path.join(self.rootdir, "a"),
+            os.path.join(self.rootdir, "a", "b", "c"),
+            self.dirs[0]]
+        FileSystemService.makedirs_batch(paths)
+        for path in paths:
+            self.assertTrue(os.path.isdir(path))
+
+    def test_symlink_at(self):
+        link_dir = self.dirs[1]
+        with FileSystemService.open_directory(link_dir) as dir_fd:
+            FileSystemService.symlink_at(
+                os.path.relpath(self.files[0], link_dir),
+                "link-to-file",
+                dir_fd)
+        self.assertTrue(os.path.samefile(self.files[0], os.path.join(link_dir, "link-to-file")))
+
+    def test_copy(self):
+        source = self.files[0]
+        with open(source, 'wb') as fh:
+            fh.write(os.urandom(4096))
+        dest = os.path.join(self.rootdir, "copy-of-file")
+        FileSystemService.copy(source, dest)
+        with open(source, 'rb') as src_fh, open(dest, 'rb') as dest_fh:
+            self.assertEqual(src_fh.read(), dest_fh.read())
+
+    def test_copy_when_copy_file_range_copies_nothing(self):
+        source = self.files[0]
+        with open(source, 'wb') as fh:
+            fh.write(os.urandom(4096))
+        dest = os.path.join(self.rootdir, "copy-of-file")
+        with mock.patch("os.copy_file_range", create=True, return_value=0):
+            FileSystemService.copy(source, dest)
+        with open(source, 'rb') as src_fh, open(dest, 'rb') as dest_fh:
+            self.assertEqual(src_fh.read(), dest_fh.read())
+
+    def test_copy_same_file(self):
+        source = self.files[0]
+        content = os.urandom(4096)
+        with open(source, 'wb') as fh:
+            fh.write(content)
+        hardlink = os.path.join(self.rootdir, "hardlink-to-file")
+        os.link(source, hardlink)
+        symlink = os.path.join(self.rootdir, "symlink-to-file")
+        os.symlink(source, symlink)
+        for dest in (source, hardlink, symlink):
+            with self.assertRaises(shutil.SameFileError):
+                FileSystemService.copy(source, dest)
+        with open(source, 'rb') as fh:
+            self.assertEqual(content, fh.read())
+
+    def test_copy_directory(self):
+        dest = os.path.join(self.rootdir, "copy-of-dir")
+        FileSystemService.copy(self.dirs[0], dest)
+        self.assertListEqual(
+            sorted(map(os.path.basename, self.files[3:6])),
+            sorted(os.listdir(dest)))
+
+    def test_relpath(self):
+        paths_and_starts = [
+            ("/foo/bar/baz", "/foo"),
+            ("/foo/bar/baz", "/foo/"),
+            ("/foo/bar/baz", "/foo/bar/baz"),
+            ("/foo/bar/baz/", "/foo"),
+            ("/foo/bar/../baz", "/foo"),
+            ("/foo/./bar", "/foo"),
+            ("/foo//bar", "/foo"),
+            ("/foo/bar", "/foo/./"),
+            ("/foo/bar", "/foo/baz"),
+            ("/foobar/baz", "/foo"),
+            ("/foo/bar", "/"),
+            ("foo/bar", "foo"),
+            ("foo/bar", "baz"),
+            ("foo/bar", "")]
+        for path, start in paths_and_starts:
+            self.assertEqual(
+                os.path.relpath(path, start),
+                FileSystemService.relpath(path, start),
+                msg="relpath({}, {})".format(path, start))
@@ -48,3 +48,25 @@ class TestMetadataService(unittest.TestCase):
         with os.fdopen(fd, 'w') as fh:
             fh.writelines(strings_to_hash)
         self.assertEqual(expected_hash, MetadataService.hash_file(file_to_hash))
+
+    def test_hash_file_multiple_blocks(self):
+        file_contents = os.urandom(int(2.5 * MetadataService.HASH_BLOCK_SIZE))
+        file_to_hash = os.path.join(self.rootdir, "file-to-hash")
+        with open(file_to_hash, 'wb') as fh:
+            fh.write(file_contents)
+        hash_obj = self.metadata_service.get_hash_object()
+        hash_obj.update(file_contents)
+        self.assertEqual(hash_obj.hexdigest(), MetadataService.hash_file(file_to_hash))
+
+    def test_write_and_parse_checksum_file(self):
+        checksums = {
+            "path/to/a-file": "checksum-for-a-file",
+            "path/to/a file with spaces": "checksum-for-a-file-with-spaces"}
+        checksum_file = os.path.join(self.rootdir, "checksums.md5")
+        self.metadata_service.write_checksum_file(checksum_file, checksums)
+        with open(checksum_file) as fh:
+            self.assertEqual(
+                "checksum-for-a-file  path/to/a-file\n"
+                "checksum-for-a-file-with-spaces  path/to/a file with spaces\n",
+                fh.read())
+        self.assertDictEqual(checksums, self.metadata_service.parse_checksum_file(checksum_file))
@@ -1,5 +1,7 @@
 import mock
 import os
+import threading
+import time
 import unittest
 
 from delivery.exceptions import ProjectAlreadyOrganisedException
@@ -48,7 +50,52 @@ class TestOrganiseService(unittest.TestCase):
                 os.path.dirname(
                     os.path.dirname(
                         self.organised_project_path)),
-                lanes)
+                frozenset(lanes))
+
+    def test_organise_runfolder_multiple_projects(self):
+        self.runfolder_service.find_runfolder.return_value = self.runfolder
+        self.runfolder_service.find_projects_on_runfolder.side_effect = [self.runfolder.projects]
+        self.file_system_service.exists.return_value = False
+        with mock.patch.object(self.organise_service, "organise_project", autospec=True) as organise_project_mock:
+            organise_project_mock.side_effect = lambda runfolder, project, path, lanes: project.name
+            organised_runfolder = self.organise_service.organise_runfolder(self.runfolder.name, [], [], False)
+            self.assertListEqual(
+                [project.name for project in self.runfolder.projects],
+                organised_runfolder.projects)
+            self.assertEqual(len(self.runfolder.projects), organise_project_mock.call_count)
+
+    def test_organise_runfolder_concurrently(self):
+        self.runfolder_service.find_runfolder.return_value = self.runfolder
+        self.runfolder_service.find_projects_on_runfolder.side_effect = lambda *args, **kwargs: [self.project]
+        organised_project_names = set()
+        self.file_system_service.list_directory_entries.side_effect = lambda path: set(organised_project_names)
+
+        def _organise_project(runfolder, project, organised_projects_path, lanes):
+            # give a concurrent call the chance to check the project before it has been organised
+            time.sleep(0.1)
+            organised_project_names.add(project.name)
+            return project.name
+
+        results = []
+
+        def _organise_runfolder():
+            try:
+                results.append(self.organise_service.organise_runfolder(self.runfolder.name, [], [], False))
+            except ProjectAlreadyOrganisedException as e:
+                results.append(e)
+
+        with mock.patch.object(self.organise_service, "organise_project", autospec=True) as organise_project_mock:
+            organise_project_mock.side_effect = _organise_project
+            threads = [threading.Thread(target=_organise_runfolder) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        organise_project_mock.assert_called_once()
+        self.assertEqual(1, len([result for result in results if isinstance(result, ProjectAlreadyOrganisedException)]))
+        # the lock for the runfolder is dropped once no thread uses it
+        self.assertEqual(0, len(self.organise_service._runfolder_locks))
 
     def test_check_previously_organised_project(self):
         organised_project_base_path = os.path.dirname(self.organised_project_path)
@@ -76,8 +123,33 @@ class TestOrganiseService(unittest.TestCase):
             True)
         self.file_system_service.rename.assert_called_once()
 
+    def test_check_previously_organised_project_backup_dir_checked_once(self):
+        organised_projects_path = os.path.join(self.project.runfolder_path, "Projects")
+        backup_path = "{}.bak".format(organised_projects_path)
+        self.file_system_service.exists.side_effect = lambda p: p != backup_path
+        existing_paths = {}
+        timestamp = 1234567890.0
+        for project in self.runfolder.projects:
+            self.organise_service.check_previously_organised_project(
+                project,
+                organised_projects_path,
+                True,
+                existing_paths=existing_paths,
+                timestamp=timestamp)
+        self.file_system_service.mkdir.assert_called_once_with(backup_path)
+        self.file_system_service.rename.assert_has_calls([
+            mock.call(
+                os.path.join(organised_projects_path, project.name),
+                os.path.join(backup_path, "{}.{}".format(project.name, timestamp)))
+            for project in self.runfolder.projects])
+        self.assertEqual(
+            1,
+            [c.args[0] for c in self.file_system_service.exists.call_args_list].count(backup_path))
+        self.assertEqual(len(self.runfolder.projects), self.file_system_service.rename.call_count)
+
     def test_organise_runfolder_already_organised(self):
         self.runfolder_service.find_runfolder.return_value = self.runfolder
+        self.file_system_service.list_directory_entries.return_value = {self.project.name}
         self.file_system_service.exists.return_value = True
         with mock.patch.object(self.organise_service, "organise_project", autospec=True) as organise_project_mock:
             expected_organised_project = "this-is-an-organised-project"
@@ -98,6 +170,11 @@ class TestOrganiseService(unittest.TestCase):
             self.assertEqual(self.runfolder.checksums, organised_runfolder.checksums)
             self.assertListEqual([expected_organised_project], organised_runfolder.projects)
 
+            # the organised project paths are looked up in the directory listing
+            self.assertNotIn(
+                os.path.dirname(self.organised_project_path),
+                [c.args[0] for c in self.file_system_service.exists.call_args_list])
+
     def test_organise_project(self):
         with mock.patch.object(
                 self.organise_service, "organise_sample", autospec=True) as organise_sample_mock, \
@@ -123,22 +200,40 @@ class TestOrganiseService(unittest.TestCase):
                     )
                 )
                 for project_file in self.project.project_files])
+            self.file_system_service.makedirs_batch.assert_called_once_with(
+                [self.organised_project_path] + [
+                    os.path.join(self.organised_project_path, sample.sample_id)
+                    for sample in self.project.samples
+                    if any(sample_file.lane_no in lanes for sample_file in sample.sample_files)])
 
     def test_organise_sample(self):
         # relative symlinks should be created with the correct arguments
         self.file_system_service.relpath.side_effect = os.path.relpath
         self.file_system_service.dirname.side_effect = os.path.dirname
+        sample_dir_fd = self.file_system_service.open_directory.return_value.__enter__.return_value
         for sample in self.project.samples:
             organised_sample = self.organise_service.organise_sample(sample, self.organised_project_path, [])
+            self.file_system_service.open_directory.assert_called_with(
+                os.path.join(self.organised_project_path, sample.sample_id))
             sample_file_dir = os.path.relpath(
                 os.path.dirname(
                     sample.sample_files[0].file_path),
                 self.project.runfolder_path)
             relative_path = os.path.join("..", "..", "..", "..", sample_file_dir)
-            self.file_system_service.symlink.assert_has_calls([
+            self.file_system_service.symlink_at.assert_has_calls([
                 mock.call(
                     os.path.join(relative_path, os.path.basename(sample_file.file_path)),
-                    sample_file.file_path) for sample_file in organised_sample.sample_files])
+                    sample_file.file_name,
+                    sample_dir_fd) for sample_file in organised_sample.sample_files])
+
+    def test_organise_sample_relpath_once_per_source_dir(self):
+        self.file_system_service.relpath.side_effect = os.path.relpath
+        for sample in self.project.samples:
+            self.file_system_service.relpath.reset_mock()
+            self.organise_service.organise_sample(sample, self.organised_project_path, [])
+            self.assertEqual(
+                len(set(os.path.dirname(sample_file.file_path) for sample_file in sample.sample_files)),
+                self.file_system_service.relpath.call_count)
 
     def test_organise_sample_exclude_by_lane(self):
 
@@ -146,6 +241,7 @@ class TestOrganiseService(unittest.TestCase):
         for sample in self.project.samples:
             organised_sample = self.organise_service.organise_sample(sample, self.organised_project_path, [0])
             self.assertListEqual([], organised_sample.sample_files)
+        self.file_system_service.open_directory.assert_not_called()
 
         # a specific sample lane is excluded
         for sample in self.project.samples:
@@ -154,6 +250,13 @@ class TestOrganiseService(unittest.TestCase):
                 list(map(lambda x: x.file_name, filter(lambda f: f.lane_no in [2, 3], sample.sample_files))),
                 list(map(lambda x: x.file_name, organised_sample.sample_files)))
 
+        # excluded sample files are never passed on to be organised
+        with mock.patch.object(
+                self.organise_service, "organise_sample_file", autospec=True) as organise_sample_file_mock:
+            for sample in self.project.samples:
+                self.organise_service.organise_sample(sample, self.organised_project_path, [0])
+            organise_sample_file_mock.assert_not_called()
+
     def test_organise_sample_file(self):
         lanes = [1, 2, 3, 6, 7, 8]
         self.file_system_service.relpath.side_effect = os.path.relpath
@@ -186,7 +289,8 @@ class TestOrganiseService(unittest.TestCase):
                         os.path.basename(
                             os.path.dirname(sample_file.file_path)),
                         os.path.basename(sample_file.file_path)),
-                    expected_link_path)
+                    expected_link_path,
+                    create_parent_dirs=False)
                 for attr in ("file_name", "sample_name", "sample_index", "lane_no", "read_no", "is_index", "checksum"):
                     self.assertEqual(
                         getattr(sample_file, attr),
@@ -221,3 +325,38 @@ class TestOrganiseService(unittest.TestCase):
             mock.call(
                 os.path.join(project_files[1].file_path),
                 os.path.join(organised_project_path, "report-dir", "another-report-file"))])
+
+    def test_organise_project_file_non_normalised_path(self):
+        organised_project_path = "/bar/project"
+        project_file = RunfolderFile(
+            "/foo//a-report-file",
+            base_path="/foo",
+            file_checksum="checksum-for-a-report-file")
+        self.file_system_service.relpath.side_effect = FileSystemService.relpath
+        organised_project_file = self.organise_service.organise_project_file(
+            project_file, organised_project_path)
+        self.file_system_service.relpath.assert_called_once_with(
+            project_file.file_path,
+            project_file.base_path)
+        self.assertEqual(
+            os.path.join(organised_project_path, "a-report-file"),
+            organised_project_file.file_path)
+        self.file_system_service.copy.assert_called_once_with(
+            project_file.file_path,
+            os.path.join(organised_project_path, "a-report-file"))
+
+    def test_organise_project_file_base_path_not_a_prefix(self):
+        organised_project_path = "/bar/project"
+        project_file = RunfolderFile(
+            "/foo/reports/a-report-file",
+            base_path="/foo/reports/../other",
+            file_checksum="checksum-for-a-report-file")
+        self.file_system_service.relpath.side_effect = os.path.relpath
+        organised_project_file = self.organise_service.organise_project_file(
+            project_file, organised_project_path)
+        self.file_system_service.relpath.assert_called_once_with(
+            project_file.file_path,
+            project_file.base_path)
+        self.assertEqual(
+            os.path.abspath(os.path.join(organised_project_path, "..", "reports", "a-report-file")),
+            organised_project_file.file_path)
@@ -0,0 +1,33 @@
+
+import unittest
+
+from delivery.exceptions import ProjectNotFoundException
+from delivery.services.runfolder_service import RunfolderService
+
+from tests.test_utils import FAKE_RUNFOLDERS
+
+
+class TestRunfolderService(unittest.TestCase):
+
+    def setUp(self):
+        self.runfolder = FAKE_RUNFOLDERS[0]
+        self.runfolder_service = RunfolderService(runfolder_repo=None)
+
+    def test_find_projects_on_runfolder(self):
+        self.assertListEqual(
+            self.runfolder.projects,
+            list(self.runfolder_service.find_projects_on_runfolder(self.runfolder)))
+
+    def test_find_projects_on_runfolder_only_these_projects(self):
+        project = self.runfolder.projects[-1]
+        self.assertListEqual(
+            [project],
+            list(self.runfolder_service.find_projects_on_runfolder(
+                self.runfolder,
+                only_these_projects=[project.name, project.name])))
+
+    def test_find_projects_on_runfolder_unknown_project(self):
+        with self.assertRaises(ProjectNotFoundException):
+            list(self.runfolder_service.find_projects_on_runfolder(
+                self.runfolder,
+                only_these_projects=["this-project-does-not-exist"]))
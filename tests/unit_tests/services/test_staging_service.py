@@ -3,6 +3,7 @@ import signal
 import random
 import os
 import tempfile
+import unittest
 
 from tornado.testing import AsyncTestCase
 from tornado.gen import coroutine
@@ -46,7 +47,7 @@ class TestStagingService(AsyncTestCase):
 
         self.mock_general_project_repo = mock.MagicMock()
 
-        stdout_mimicing_rsync = """
+        self.stdout_mimicing_rsync = """
             Number of files: 1 (reg: 1)
             Number of created files: 0
             Number of deleted files: 0
@@ -75,7 +76,7 @@ class TestStagingService(AsyncTestCase):
 
         @coroutine
         def wait_as_coroutine(x):
-            return ExecutionResult(stdout=stdout_mimicing_rsync, stderr="", status_code=0)
+            return ExecutionResult(stdout=self.stdout_mimicing_rsync, stderr="", status_code=0)
 
         self.mock_external_runner_service.wait_for_execution = wait_as_coroutine
         mock_staging_repo = mock.MagicMock()
@@ -102,6 +103,7 @@ class TestStagingService(AsyncTestCase):
     @tornado.testing.gen_test
     def test_stage_order(self):
         res = yield self.staging_service.stage_order(stage_order=self.staging_order1)
+        self.assertTrue(self.mock_external_runner_service.run.call_args.kwargs["start_new_session"])
 
         def _get_stating_status():
             return self.staging_order1.status
@@ -111,6 +113,161 @@ class TestStagingService(AsyncTestCase):
 
         assert_eventually_equals(self, 1, _get_stating_status, StagingStatus.staging_successful)
         self.assertEqual(self.staging_order1.size, 207707566)
+        self.mock_file_system_service.makedirs.assert_called_once_with(
+            self.staging_order1.staging_target, exist_ok=True)
+        self.mock_file_system_service.exists.assert_not_called()
+
+    # - Split a staging order over several rsync processes
+    @tornado.testing.gen_test
+    def test_stage_order_parallel_rsync_workers(self):
+        with tempfile.TemporaryDirectory() as source_dir:
+            for i, file_size in enumerate((3, 2, 2, 1)):
+                os.makedirs(os.path.join(source_dir, "dir_{}".format(i)))
+                with open(os.path.join(source_dir, "dir_{}".format(i), "file_{}".format(i)), "wb") as fh:
+                    fh.write(b"x" * file_size)
+            os.makedirs(os.path.join(source_dir, "empty_dir"))
+            self.staging_order1.source = source_dir
+            self.staging_service.parallel_rsync_workers = 2
+
+            file_lists = []
+            cmds = []
+
+            def _run(cmd, **kwargs):
+                cmds.append(cmd)
+                files_from = [arg for arg in cmd if arg.startswith("--files-from=")]
+                if files_from:
+                    with open(files_from[0].split("=", 1)[1]) as fh:
+                        file_lists.append(sorted(filter(None, fh.read().split("\0"))))
+                return Execution(pid=len(cmds), process_obj=mock.MagicMock())
+
+            pids_when_waiting = []
+
+            @coroutine
+            def wait_as_coroutine(execution):
+                pids_when_waiting.append(self.staging_order1.pids or [self.staging_order1.pid])
+                return ExecutionResult(stdout=self.stdout_mimicing_rsync, stderr="", status_code=0)
+
+            self.mock_external_runner_service.run.side_effect = _run
+            self.mock_external_runner_service.wait_for_execution = wait_as_coroutine
+            yield self.staging_service.stage_order(stage_order=self.staging_order1)
+
+        self.assertEqual(StagingStatus.staging_successful, self.staging_order1.status)
+        self.assertEqual(2 * 207707566, self.staging_order1.size)
+        self.assertListEqual([[1, 2], [1, 2], [3]], pids_when_waiting)
+        # the directories, including the empty one, are copied in a final pass
+        self.assertEqual(3, len(cmds))
+        self.assertIn("--include=*/", cmds[-1])
+        self.assertIn("--exclude=*", cmds[-1])
+        self.assertListEqual(
+            [[os.path.join("dir_0", "file_0"), os.path.join("dir_3", "file_3")],
+             [os.path.join("dir_1", "file_1"), os.path.join("dir_2", "file_2")]],
+            sorted(file_lists))
+
+    # - Kill the processes that were started, if starting a staging order fails part way
+    @mock.patch.object(StagingService, "_kill_process_group")
+    @tornado.testing.gen_test
+    def test_stage_order_parallel_rsync_workers_failed_to_start(self, mock_kill_process_group):
+        with tempfile.TemporaryDirectory() as source_dir:
+            for i in range(2):
+                with open(os.path.join(source_dir, "file_{}".format(i)), "wb") as fh:
+                    fh.write(b"x")
+            self.staging_order1.source = source_dir
+            self.staging_service.parallel_rsync_workers = 2
+
+            self.mock_external_runner_service.run.side_effect = [
+                Execution(pid=1337, process_obj=mock.MagicMock()),
+                OSError("Too many open files")]
+            yield self.staging_service.stage_order(stage_order=self.staging_order1)
+
+        self.assertEqual(StagingStatus.staging_failed, self.staging_order1.status)
+        mock_kill_process_group.assert_called_once_with(1337)
+
+    # - Hard link the files of a staging order instead of copying them
+    @tornado.testing.gen_test
+    def test_stage_order_hardlink(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            source_dir = os.path.join(root_dir, "source")
+            runfolder_dir = os.path.join(root_dir, "runfolder")
+            staging_target = os.path.join(root_dir, "staging")
+            os.makedirs(os.path.join(runfolder_dir, "sample"))
+            os.makedirs(source_dir)
+            with open(os.path.join(runfolder_dir, "sample", "file.fastq.gz"), "wb") as fh:
+                fh.write(b"x" * 1024)
+            os.symlink(os.path.join(runfolder_dir, "sample"), os.path.join(source_dir, "sample"))
+
+            self.staging_order1.source = source_dir
+            self.staging_order1.staging_target = staging_target
+            self.staging_service.external_program_service = ExternalProgramService()
+            self.staging_service.file_system_service = FileSystemService()
+            self.staging_service.staging_mode = "hardlink"
+            yield self.staging_service.stage_order(stage_order=self.staging_order1)
+
+            self.assertEqual(StagingStatus.staging_successful, self.staging_order1.status)
+            self.assertEqual(1024, self.staging_order1.size)
+            staged_file = os.path.join(staging_target, "sample", "file.fastq.gz")
+            self.assertFalse(os.path.islink(os.path.join(staging_target, "sample")))
+            self.assertTrue(os.path.samefile(os.path.join(runfolder_dir, "sample", "file.fastq.gz"), staged_file))
+
+    # - Copy the files of a staging order if they could not be hard linked
+    @tornado.testing.gen_test
+    def test_stage_order_hardlink_failed(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            source_dir = os.path.join(root_dir, "source")
+            staging_target = os.path.join(root_dir, "staging")
+            os.makedirs(source_dir)
+            os.makedirs(os.path.join(staging_target, "partially_linked"))
+            with open(os.path.join(source_dir, "file.fastq.gz"), "wb") as fh:
+                fh.write(b"x" * 1024)
+
+            self.staging_order1.source = source_dir
+            self.staging_order1.staging_target = staging_target
+            self.staging_service.file_system_service = FileSystemService()
+            self.staging_service.staging_mode = "hardlink"
+
+            self.mock_external_runner_service.run.side_effect = \
+                lambda cmd, **kwargs: Execution(pid=random.randint(1, 1000), process_obj=cmd[0])
+
+            @coroutine
+            def wait_as_coroutine(execution):
+                if execution.process_obj == "cp":
+                    return ExecutionResult(stdout="", stderr="Invalid cross-device link", status_code=1)
+                # the partially linked files should have been removed before copying
+                self.assertListEqual([], os.listdir(staging_target))
+                return ExecutionResult(stdout=self.stdout_mimicing_rsync, stderr="", status_code=0)
+
+            self.mock_external_runner_service.wait_for_execution = wait_as_coroutine
+            yield self.staging_service.stage_order(stage_order=self.staging_order1)
+
+            self.assertEqual(StagingStatus.staging_successful, self.staging_order1.status)
+            self.assertListEqual(
+                ["cp", "rsync"],
+                [call.args[0][0] for call in self.mock_external_runner_service.run.call_args_list])
+            self.assertEqual(207707566, self.staging_order1.size)
+
+    # - Copy the files of a staging order if they are linked from another file system
+    @unittest.skipUnless(
+        os.path.isdir("/dev/shm") and os.stat("/dev/shm").st_dev != os.stat(tempfile.gettempdir()).st_dev,
+        "requires /dev/shm on a different file system than the temporary directory")
+    @tornado.testing.gen_test
+    def test_stage_order_hardlink_from_other_file_system(self):
+        with tempfile.TemporaryDirectory() as root_dir, tempfile.TemporaryDirectory(dir="/dev/shm") as runfolder_dir:
+            source_dir = os.path.join(root_dir, "source")
+            staging_target = os.path.join(root_dir, "staging")
+            os.makedirs(os.path.join(runfolder_dir, "sample"))
+            os.makedirs(source_dir)
+            with open(os.path.join(runfolder_dir, "sample", "file.fastq.gz"), "wb") as fh:
+                fh.write(b"x" * 1024)
+            os.symlink(os.path.join(runfolder_dir, "sample"), os.path.join(source_dir, "sample"))
+
+            self.staging_order1.source = source_dir
+            self.staging_order1.staging_target = staging_target
+            self.staging_service.file_system_service = FileSystemService()
+            self.staging_service.staging_mode = "hardlink"
+            yield self.staging_service.stage_order(stage_order=self.staging_order1)
+
+            self.assertEqual(StagingStatus.staging_successful, self.staging_order1.status)
+            self.assertEqual("rsync", self.mock_external_runner_service.run.call_args.args[0][0])
+            self.assertEqual(207707566, self.staging_order1.size)
 
     # - Set status to failed if rsyncing is not successful
     @tornado.testing.gen_test
@@ -183,6 +340,35 @@ class TestStagingService(AsyncTestCase):
         mock_os.kill.assert_called_with(self.staging_order1.pid, signal.SIGTERM)
         self.assertFalse(actual)
 
+    @mock.patch('delivery.services.staging_service.os')
+    def test_kill_stage_order_process_group(self, mock_os):
+        # If the process leads its own process group, the whole group should be killed
+        self.staging_order1.status = StagingStatus.staging_in_progress
+        self.staging_order1.pid = 1337
+        mock_os.getpgid.return_value = self.staging_order1.pid
+        actual = self.staging_service.kill_process_of_staging_order(self.staging_order1.id)
+        mock_os.killpg.assert_called_once_with(self.staging_order1.pid, signal.SIGTERM)
+        mock_os.kill.assert_not_called()
+        self.assertTrue(actual)
+
+    @mock.patch('delivery.services.staging_service.os')
+    def test_kill_stage_order_parallel_rsync_workers(self, mock_os):
+        self.staging_order1.status = StagingStatus.staging_in_progress
+        self.staging_order1.pid = 1337
+        self.staging_order1.pids = [1337, 1338]
+
+        # all processes should be killed, even if some of them have already finished
+        mock_os.kill.side_effect = [OSError, None]
+        actual = self.staging_service.kill_process_of_staging_order(self.staging_order1.id)
+        mock_os.kill.assert_has_calls([mock.call(pid, signal.SIGTERM) for pid in self.staging_order1.pids])
+        self.assertTrue(actual)
+
+        # but it is a failure if none of them could be killed
+        self.staging_order1.status = StagingStatus.staging_in_progress
+        mock_os.kill.side_effect = OSError
+        actual = self.staging_service.kill_process_of_staging_order(self.staging_order1.id)
+        self.assertFalse(actual)
+
     @mock.patch('delivery.services.staging_service.os')
     def test_kill_stage_order_not_valid_state(self, mock_os):
         # If the status is not in progress it should not be possible to kill it.
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, event
+
+from delivery.app import compose_application, configure_sqlite_connection
+
+
+class TestConfigureSqliteConnection(unittest.TestCase):
+
+    def test_configure_sqlite_connection(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine("sqlite:///{}".format(os.path.join(tmp_dir, "delivery.db")))
+            event.listen(engine, "connect", configure_sqlite_connection)
+            with engine.connect() as connection:
+                self.assertEqual("wal", connection.exec_driver_sql("PRAGMA journal_mode").scalar())
+                self.assertEqual(30000, connection.exec_driver_sql("PRAGMA busy_timeout").scalar())
+            engine.dispose()
+
+
+class TestComposeApplication(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        path_to_this_file = os.path.abspath(os.path.dirname(__file__))
+        self.config = {
+            "staging_directory": self.tmp_dir.name,
+            "runfolder_directory": self.tmp_dir.name,
+            "project_links_directory": self.tmp_dir.name,
+            "readme_directory": self.tmp_dir.name,
+            "general_project_directory": self.tmp_dir.name,
+            "db_connection_string": "sqlite:///{}".format(os.path.join(self.tmp_dir.name, "delivery.db")),
+            "alembic_path": os.path.join(path_to_this_file, "..", "..", "alembic"),
+            "dds_conf": {"log_path": os.path.join(self.tmp_dir.name, "dds.log")},
+        }
+
+    def test_compose_application(self):
+        composed_application = compose_application(self.config)
+        self.assertEqual("copy", composed_application["staging_service"].staging_mode)
+
+    def test_compose_application_invalid_staging_mode(self):
+        self.config["staging_mode"] = "symlink"
+        with self.assertRaises(AssertionError):
+            compose_application(self.config)
+
+    def test_compose_application_invalid_parallel_rsync_workers(self):
+        for parallel_rsync_workers in (0, -1, 1.5, "2"):
+            self.config["parallel_rsync_workers"] = parallel_rsync_workers
+            with self.assertRaises(AssertionError):
+                compose_application(self.config)